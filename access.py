@@ -0,0 +1,83 @@
+import os
+import hmac
+import time
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from dotenv import load_dotenv
+from models import Link
+from metrics import observe_bcrypt
+
+load_dotenv()
+
+# Access token configuration
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", 60 * 60))  # 1 hour in seconds
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", 4))
+
+# Tokens are signed with ACCESS_TOKEN_SECRET. Without it we derive a key from the admin
+# credentials so every worker agrees on it and changing the admin password revokes all tokens.
+_secret = os.getenv("ACCESS_TOKEN_SECRET")
+if _secret == "change_me":
+    print("Warning: ACCESS_TOKEN_SECRET is the published example value, so anyone can forge file access "
+          "tokens; set a long random secret or leave it unset")
+if _secret:
+    TOKEN_KEY = _secret.encode()
+else:
+    TOKEN_KEY = hashlib.sha256(
+        f"file-access:{os.getenv('ADMIN_USERNAME')}:{os.getenv('ADMIN_PASSWORD')}".encode()
+    ).digest()
+
+# bcrypt takes hundreds of milliseconds of CPU, so it runs here instead of on the event loop
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+
+def _signature(link: Link, expires: int) -> str:
+    # Scoped to the row and its password hash, so re-uploads and password changes invalidate tokens
+    message = f"{link.id}\n{link.custom_link}\n{link.file_password}\n{expires}".encode()
+    return hmac.new(TOKEN_KEY, message, hashlib.sha256).hexdigest()
+
+
+def issue_access_token(link: Link) -> str:
+    """Create a token granting access to one link until it expires"""
+    expires = int(time.time()) + ACCESS_TOKEN_TTL
+    return f"{expires}.{_signature(link, expires)}"
+
+
+def verify_access_token(link: Link, token: Optional[str]) -> bool:
+    """Check a token issued by issue_access_token; costs one HMAC instead of a bcrypt verify"""
+    if not token:
+        return False
+    expires, _, signature = token.partition(".")
+    try:
+        expires = int(expires)
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(link, expires))
+
+
+def access_cookie_name(custom_link: str) -> str:
+    """Per-link cookie name; link names may contain characters that are not valid in cookies"""
+    return "file_access_" + hashlib.sha256(custom_link.encode()).hexdigest()[:16]
+
+
+def _timed(operation: str, function, *args):
+    started = time.perf_counter()
+    try:
+        return function(*args)
+    finally:
+        observe_bcrypt(operation, started)
+
+
+async def verify_password(link: Link, password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bcrypt_pool, _timed, "verify", link.verify_password, password)
+
+
+async def hash_password(password: Optional[str]) -> Optional[str]:
+    if not password:
+        return None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bcrypt_pool, _timed, "hash", Link.hash_password, password)
@@ -0,0 +1,95 @@
+import os
+import time
+import zipfile
+from typing import Iterator, List, NamedTuple
+from storage import UPLOAD_CHUNK_SIZE
+
+
+class ArchiveEntry(NamedTuple):
+    name: str
+    path: str
+    mtime: float
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that hands written bytes back to the generator.
+
+    zipfile notices it cannot seek and writes data descriptors after each member instead of
+    patching local headers, so nothing has to be buffered beyond the current chunk.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_names(names: List[str]) -> List[str]:
+    """Make archive member names unique by numbering repeats: report.pdf, report (2).pdf, ..."""
+    seen = set()
+    result = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate in seen:
+            n += 1
+            candidate = f"{stem} ({n}){ext}"
+        seen.add(candidate)
+        result.append(candidate)
+    return result
+
+
+def missing_entries(entries: List[ArchiveEntry]) -> List[str]:
+    """Names of entries whose file is not on disk; checked before streaming so the request can still fail"""
+    return [entry.name for entry in entries if not os.path.isfile(entry.path)]
+
+
+def stream_zip(entries: List[ArchiveEntry]) -> Iterator[bytes]:
+    """Yield a ZIP archive of the given files chunk by chunk with constant memory use.
+
+    Members are stored uncompressed: most uploads are compressed formats already and
+    storing keeps the archive as fast to build as a plain file read. A file deleted after
+    missing_entries() was checked is left out and listed in a final MISSING.txt member,
+    since the 200 status has been sent by then.
+    """
+    sink = _ChunkSink()
+    skipped = []
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry.name, date_time=time.localtime(max(entry.mtime, 315532800))[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            try:
+                source = open(entry.path, "rb")
+            except FileNotFoundError:
+                print(f"ZIP member {entry.name} is missing from storage: {entry.path}")
+                skipped.append(entry.name)
+                continue
+            with source, archive.open(info, mode="w", force_zip64=True) as member:
+                for block in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+                    member.write(block)
+                    yield sink.drain()
+            # Member header and data descriptor
+            yield sink.drain()
+        if skipped:
+            notice = "These files were removed while the archive was being built:\n" + "".join(
+                f"{name}\n" for name in skipped
+            )
+            archive.writestr(unique_names([entry.name for entry in entries] + ["MISSING.txt"])[-1], notice)
+            yield sink.drain()
+    # Central directory
+    yield sink.drain()
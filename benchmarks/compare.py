@@ -0,0 +1,60 @@
+"""Compare two benchmark result files from benchmarks/run.py.
+
+    python benchmarks/compare.py baseline.json candidate.json --threshold 10
+
+Prints the change of every shared metric and exits with status 1 when a latency
+grew, or a throughput dropped, by more than the threshold (percent).
+"""
+import sys
+import json
+import argparse
+
+# Metrics where a larger value is better; every other *_ms metric is better when smaller
+HIGHER_IS_BETTER = {"throughput_mib_s", "requests_per_second"}
+
+
+def result_key(result) -> tuple:
+    return (result["name"],) + tuple(sorted((k, str(v)) for k, v in result["params"].items()))
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], {result_key(result): result["metrics"] for result in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    baseline_meta, baseline = load(args.baseline)
+    candidate_meta, candidate = load(args.candidate)
+    print(f"baseline  {baseline_meta['commit'][:12]}  {baseline_meta['timestamp']}")
+    print(f"candidate {candidate_meta['commit'][:12]}  {candidate_meta['timestamp']}")
+
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        name = key[0] + " " + " ".join(f"{k}={v}" for k, v in key[1:])
+        for metric, old in baseline[key].items():
+            new = candidate[key].get(metric)
+            tracked = metric in HIGHER_IS_BETTER or metric.endswith("_ms")
+            if not tracked or new is None or not old:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = ""
+            if worse > args.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{name:60} {metric:20} {old:>12} -> {new:>12} ({change:+.1f}%){flag}")
+
+    for key in sorted(baseline.keys() - candidate.keys()):
+        print(f"missing from candidate: {key}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
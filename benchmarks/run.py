@@ -0,0 +1,411 @@
+"""Upload/download benchmark suite.
+
+Runs against a scratch database and upload directory, either in-process (ASGI transport)
+or through a real uvicorn server, and writes machine-readable JSON results that
+benchmarks/compare.py can diff between commits.
+
+    python benchmarks/run.py --db sqlite --mode inprocess --output results.json
+    python benchmarks/run.py --db sqlite,postgres --mode inprocess,uvicorn --output results.json
+
+Postgres uses the DB_HOST/DB_PORT/DB_USER/DB_PASSWORD settings from the environment and
+the BENCH_DB_NAME database (default file_storage_bench), which is wiped before each run.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+FILE_PASSWORD = "file-password"
+
+# (upload sizes in bytes, uploads per size, requests per concurrency level, concurrency levels, listing sizes)
+PROFILES = {
+    "quick": ([64 * 1024, 1024 * 1024, 16 * 1024 * 1024], 3, 200, [1, 16], [1000, 10000]),
+    "full": ([64 * 1024, 1024 * 1024, 16 * 1024 * 1024, 256 * 1024 * 1024], 5, 2000, [1, 16, 64], [1000, 10000, 100000]),
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary(latencies, elapsed):
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+    }
+
+
+def bench_environment(db: str, workdir: str) -> dict:
+    """Environment for the app under test; set before main is imported or uvicorn is started"""
+    env = dict(os.environ)
+    env.update({
+        "ADMIN_USERNAME": BENCH_USER,
+        "ADMIN_PASSWORD": BENCH_PASSWORD,
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "DB_TYPE": db,
+        # Derivatives and compression run in the background and would only add noise
+        "PREVIEW_WORKERS": "1",
+        "COMPRESSION_ENABLED": "false",
+        "METRICS_ENABLED": "true",
+    })
+    if db == "sqlite":
+        env["DATABASE_PATH"] = os.path.join(workdir, "data")
+        env["DB_NAME"] = "bench"
+    else:
+        env["DB_NAME"] = os.getenv("BENCH_DB_NAME", "file_storage_bench")
+    return env
+
+
+def prepare_database(env: dict):
+    if env["DB_TYPE"] == "postgres":
+        import psycopg2
+        conn = psycopg2.connect(
+            dbname="postgres",
+            user=env.get("DB_USER", "postgres"),
+            password=env.get("DB_PASSWORD", ""),
+            host=env.get("DB_HOST", "localhost"),
+            port=env.get("DB_PORT", "5432"),
+        )
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{env["DB_NAME"]}"')
+        conn.close()
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=REPO_ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def seed_links(count: int, start: int):
+    """Insert listing rows directly; the home page only reads them"""
+    from sqlalchemy import insert
+    from database import engine
+    from models import Link
+
+    batch = []
+    with engine.begin() as conn:
+        for i in range(start, count):
+            batch.append({
+                "custom_link": f"seed-{i}",
+                "base_link": f"seed-{i}",
+                "file_path": f"/nonexistent/seed-{i}",
+                "filename": f"seed-{i}.bin",
+                "is_public": i % 2 == 0,
+                "size": 1024,
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(Link), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Link), batch)
+
+
+async def run_concurrently(send, total: int, concurrency: int):
+    """Issue `total` requests with `concurrency` in flight; returns latencies and wall time"""
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            response = await send(i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(f"{errors} of {total} requests failed")
+    return latencies, elapsed
+
+
+async def upload(client, custom_link: str, content: bytes, filename: str, **data):
+    response = await client.post(
+        "/upload/",
+        data={"custom_link": custom_link, **data},
+        files={"file": (filename, content)},
+    )
+    # Uploads redirect back to the file page on success and to / with ?error= on failure
+    if response.status_code != 303 or "error=" in response.headers.get("location", ""):
+        raise RuntimeError(f"upload of {custom_link} failed: {response.headers.get('location')}")
+
+
+async def bench_uploads(client, sizes, repeats):
+    results = []
+    for size in sizes:
+        payload = bytearray(os.urandom(min(size, 1024 * 1024)) * (size // (1024 * 1024) or 1))[:size]
+        timings = []
+        for i in range(repeats):
+            # Distinct content every time so the blob store never short-circuits on a duplicate
+            payload[:8] = os.urandom(8)
+            started = time.perf_counter()
+            await upload(client, f"upload-{size}-{i}", bytes(payload), f"upload-{size}.bin")
+            timings.append(time.perf_counter() - started)
+        median = percentile(timings, 0.5)
+        results.append({
+            "name": "upload",
+            "params": {"size_bytes": size, "repeats": repeats},
+            "metrics": {
+                "p50_ms": round(median * 1000, 3),
+                "max_ms": round(max(timings) * 1000, 3),
+                "throughput_mib_s": round(size / median / (1024 * 1024), 2),
+            },
+        })
+    return results
+
+
+async def bench_downloads(client, total, levels):
+    results = []
+    await upload(client, "bench-download", os.urandom(1024 * 1024), "download.bin", is_public="true")
+    log = b"".join(b"%08d benchmark log line with some text\n" % i for i in range(100000))
+    await upload(client, "bench-preview", log, "preview.log", is_public="true")
+
+    cases = [
+        ("download", lambda i: client.get("/download/bench-download")),
+        ("download_range", lambda i: client.get("/download/bench-download", headers={"Range": "bytes=0-65535"})),
+        ("preview", lambda i: client.get("/preview/bench-preview")),
+    ]
+    # Build the preview derivative before timing
+    await client.get("/preview/bench-preview")
+    for name, send in cases:
+        for concurrency in levels:
+            latencies, elapsed = await run_concurrently(send, total, concurrency)
+            results.append({
+                "name": name,
+                "params": {"concurrency": concurrency},
+                "metrics": latency_summary(latencies, elapsed),
+            })
+    return results
+
+
+async def bench_password_downloads(client, total, levels):
+    results = []
+    await upload(client, "bench-protected", os.urandom(64 * 1024), "protected.bin", file_password=FILE_PASSWORD)
+    auth, client.auth = client.auth, None
+    try:
+        # An explicit Cookie header keeps the client's cookie jar (and the access token) out of the request,
+        # so every request pays for a bcrypt verify
+        send_password = lambda i: client.post(
+            "/download/bench-protected", data={"file_password": FILE_PASSWORD}, headers={"Cookie": "bench=1"}
+        )
+        # Requests after the first carry the signed access token instead
+        response = await send_password(0)
+        token_cookie = "; ".join(f"{name}={value}" for name, value in response.cookies.items())
+        send_token = lambda i: client.get("/download/bench-protected", headers={"Cookie": token_cookie})
+        # bcrypt is slow by design; a tenth of the requests is plenty
+        for name, send, count in (("password_download", send_password, max(total // 10, 10)),
+                                  ("token_download", send_token, total)):
+            for concurrency in levels:
+                latencies, elapsed = await run_concurrently(send, count, concurrency)
+                results.append({
+                    "name": name,
+                    "params": {"concurrency": concurrency},
+                    "metrics": latency_summary(latencies, elapsed),
+                })
+    finally:
+        client.auth = auth
+    return results
+
+
+async def bench_listing(client, sizes):
+    results = []
+    seeded = 0
+    for count in sizes:
+        await asyncio.to_thread(seed_links, count, seeded)
+        seeded = count
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            response = await client.get("/")
+            timings.append(time.perf_counter() - started)
+            response.raise_for_status()
+        results.append({
+            "name": "home_listing",
+            "params": {"links": count},
+            "metrics": {
+                "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+                "max_ms": round(max(timings) * 1000, 3),
+                "response_bytes": len(response.content),
+            },
+        })
+
+        # First page of the JSON listing the admin page loads, then a page deep into the catalogue
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            response = await client.get("/api/links", params={"sort": "size", "order": "desc"})
+            timings.append(time.perf_counter() - started)
+            response.raise_for_status()
+        cursor = response.json()["next_cursor"]
+        deep_timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            deep = await client.get("/api/links", params={"sort": "size", "order": "desc", "cursor": cursor})
+            deep_timings.append(time.perf_counter() - started)
+            deep.raise_for_status()
+            cursor = deep.json()["next_cursor"] or cursor
+        results.append({
+            "name": "api_listing",
+            "params": {"links": count},
+            "metrics": {
+                "first_page_p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+                "next_page_p50_ms": round(percentile(deep_timings, 0.5) * 1000, 3),
+                "response_bytes": len(response.content),
+            },
+        })
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(client, server, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            await client.get("/healthz")
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not start in time")
+
+
+async def run_suite(client, profile):
+    sizes, repeats, total, levels, listing_sizes = PROFILES[profile]
+    results = []
+    results += await bench_uploads(client, sizes, repeats)
+    results += await bench_downloads(client, total, levels)
+    results += await bench_password_downloads(client, total, levels)
+    # Last, since it leaves the links table large
+    results += await bench_listing(client, listing_sizes)
+    return results
+
+
+async def run_configuration(db: str, mode: str, profile: str):
+    """Run the suite for one database/mode pair; called in a fresh process per configuration"""
+    import httpx
+
+    auth = (BENCH_USER, BENCH_PASSWORD)
+    timeout = httpx.Timeout(300)
+    if mode == "inprocess":
+        from main import app
+        from database import dispose_engines
+        from previews import preview_builder
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", auth=auth, timeout=timeout) as client:
+                return await run_suite(client, profile)
+        finally:
+            # ASGITransport does not run lifespan events, so shut down what the app's handlers would
+            await dispose_engines()
+            preview_builder.shutdown()
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=REPO_ROOT,
+        env=dict(os.environ),
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", auth=auth, timeout=timeout) as client:
+            await wait_until_ready(client, server)
+            return await run_suite(client, profile)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="sqlite", help="comma-separated: sqlite, postgres")
+    parser.add_argument("--mode", default="inprocess", help="comma-separated: inprocess, uvicorn")
+    parser.add_argument("--profile", default="quick", choices=sorted(PROFILES))
+    parser.add_argument("--output", default="benchmark-results.json")
+    # Internal: run a single configuration in this process and write its results to the given file
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, REPO_ROOT)
+        os.chdir(REPO_ROOT)
+        results = asyncio.run(run_configuration(args.db, args.mode, args.profile))
+        with open(args.child, "w") as f:
+            json.dump(results, f)
+        return
+
+    runs = []
+    for db in args.db.split(","):
+        for mode in args.mode.split(","):
+            workdir = tempfile.mkdtemp(prefix=f"bench-{db}-{mode}-")
+            try:
+                env = bench_environment(db, workdir)
+                prepare_database(env)
+                print(f"Running {args.profile} benchmarks: db={db} mode={mode}", file=sys.stderr)
+                # A fresh process per configuration, since database settings are read at import time
+                child_output = os.path.join(workdir, "results.json")
+                child = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", child_output, "--db", db, "--mode", mode,
+                     "--profile", args.profile],
+                    env=env, stdout=subprocess.DEVNULL,
+                )
+                if child.returncode:
+                    raise SystemExit(f"Benchmarks failed for db={db} mode={mode}")
+                with open(child_output) as f:
+                    child_results = json.load(f)
+                for result in child_results:
+                    result["params"].update({"db": db, "mode": mode})
+                    runs.append(result)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "profile": args.profile,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": runs,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(runs)} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import gzip
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict
+from dotenv import load_dotenv
+from models import Blob
+from database import get_db
+from storage import UPLOAD_CHUNK_SIZE, VARIANT_SUFFIXES, blob_path
+
+load_dotenv()
+
+# Optional encoders; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression configuration
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))  # bytes; smaller files are not worth it
+COMPRESSION_WORKERS = int(os.getenv("COMPRESSION_WORKERS", 1))
+# A variant is only kept when it saves at least this fraction of the original size
+COMPRESSION_MIN_SAVING = 0.1
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "application/x-ndjson",
+    "application/x-yaml",
+    "application/yaml",
+    "application/sql",
+    "image/svg+xml",
+}
+COMPRESSIBLE_EXTENSIONS = {".log", ".csv", ".tsv", ".json", ".ndjson", ".jsonl", ".txt", ".xml", ".yaml", ".yml", ".md", ".sql"}
+
+# Server preference when the client accepts several encodings equally
+ENCODING_PREFERENCE = ["br", "zstd", "gzip"]
+
+# Compression is CPU heavy, so it runs on its own small pool instead of the request thread pool
+_compression_pool = ThreadPoolExecutor(max_workers=COMPRESSION_WORKERS, thread_name_prefix="compress")
+
+
+def is_compressible(mime_type: Optional[str], filename: str) -> bool:
+    if mime_type and (mime_type.startswith("text/") or mime_type in COMPRESSIBLE_TYPES):
+        return True
+    return os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def _compress_gzip(source, target):
+    with gzip.GzipFile(fileobj=target, mode="wb", compresslevel=9, mtime=0) as out:
+        for block in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+            out.write(block)
+
+
+def _compress_brotli(source, target):
+    compressor = brotli.Compressor(quality=9)
+    for block in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+        target.write(compressor.process(block))
+    target.write(compressor.finish())
+
+
+def _compress_zstd(source, target):
+    zstandard.ZstdCompressor(level=10).copy_stream(source, target, read_size=UPLOAD_CHUNK_SIZE)
+
+
+def available_encoders():
+    encoders = {"gzip": _compress_gzip}
+    if brotli is not None:
+        encoders["br"] = _compress_brotli
+    if zstandard is not None:
+        encoders["zstd"] = _compress_zstd
+    return encoders
+
+
+def compress_blob(sha256: str):
+    """Write compressed variants next to a blob and record the ones worth keeping"""
+    path = blob_path(sha256)
+    size = os.path.getsize(path)
+    variants = {}
+    for encoding, compress in available_encoders().items():
+        variant_path = path + VARIANT_SUFFIXES[encoding]
+        temp_path = f"{variant_path}.{secrets.token_hex(4)}.tmp"
+        try:
+            with open(path, "rb") as source, open(temp_path, "wb") as target:
+                compress(source, target)
+            variant_size = os.path.getsize(temp_path)
+            if variant_size <= size * (1 - COMPRESSION_MIN_SAVING):
+                os.replace(temp_path, variant_path)
+                variants[encoding] = variant_size
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    with get_db() as db:
+        blob = db.get(Blob, sha256)
+        if blob is None:
+            # Deleted while we were compressing
+            for encoding in variants:
+                os.remove(path + VARIANT_SUFFIXES[encoding])
+            return
+        blob.encodings = Blob.format_variants(variants)
+        db.commit()
+
+
+def _log_failure(future):
+    if future.exception():
+        print(f"Failed to compress blob: {future.exception()}")
+
+
+def schedule_compression(sha256: str, mime_type: Optional[str], filename: str, size: int):
+    """Queue variant generation for a newly stored blob if its type is worth compressing"""
+    if COMPRESSION_ENABLED and size >= COMPRESSION_MIN_SIZE and is_compressible(mime_type, filename):
+        _compression_pool.submit(compress_blob, sha256).add_done_callback(_log_failure)
+
+
+def choose_encoding(accept_encoding: Optional[str], variants: Dict[str, int]) -> Optional[str]:
+    """Pick the best stored variant for an Accept-Encoding header, or None for identity"""
+    if not accept_encoding or not variants:
+        return None
+
+    qualities = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in variants:
+            continue
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
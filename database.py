@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
-from contextlib import contextmanager
+from starlette.concurrency import run_in_threadpool
+from contextlib import contextmanager, asynccontextmanager
 import os
 from dotenv import load_dotenv
 
@@ -14,6 +15,26 @@ DB_NAME = os.getenv('DB_NAME', 'file-storage')
 DB_USER = os.getenv('DB_USER', 'postgres')
 DB_PASSWORD = os.getenv('DB_PASSWORD', '')
 
+# Connection pool configuration (shared by the sync and async engines)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # seconds
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))  # seconds
+# 'auto' uses aiosqlite/asyncpg when installed, 'on' requires them, 'off' runs sync sessions in a thread pool
+DB_ASYNC = os.getenv('DB_ASYNC', 'auto')
+
+# SQLite tuning. In WAL mode readers never wait for the writer, so reads get their own pool of
+# query-only connections and writes a single connection per engine; worker processes take turns
+# on the database's write lock, waiting up to SQLITE_BUSY_TIMEOUT instead of failing
+SQLITE_WAL = os.getenv('SQLITE_WAL', 'true').lower() == 'true'
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '10000'))  # milliseconds
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper()  # NORMAL is safe with WAL; FULL also survives power loss
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # bytes of the file read through mmap
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', str(64 * 1024)))  # KiB of page cache per connection
+
+if SQLITE_SYNCHRONOUS not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+    raise ValueError(f"Invalid SQLITE_SYNCHRONOUS: {SQLITE_SYNCHRONOUS}")
+
 def get_database_url():
     if DB_TYPE == 'postgres':
         return f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
@@ -26,15 +47,191 @@ def get_database_url():
         os.makedirs(data_dir, exist_ok=True)
         return f"sqlite:///{os.path.join(data_dir, f'{DB_NAME}.db')}"
 
-# Create SQLAlchemy engine
-engine = create_engine(get_database_url())
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_async_database_url():
+    url = get_database_url()
+    if DB_TYPE == 'postgres':
+        return url.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    return url.replace('sqlite://', 'sqlite+aiosqlite://', 1)
+
+def get_engine_options():
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_TYPE == 'postgres',
+    }
+
+def sqlite_pragmas(read_only: bool):
+    """Connect hook applying the SQLite settings to every new connection"""
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if SQLITE_WAL and not read_only:
+                # Persistent in the database file; switching needs a connection that may write
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+            cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE}")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+    return on_connect
+
+def create_engines(create, url: str, **kwargs):
+    """Return (write engine, read engine); they are the same engine unless SQLite runs in WAL mode"""
+    options = {**get_engine_options(), **kwargs}
+    if DB_TYPE == 'postgres':
+        engine = create(url, **options)
+        return engine, engine
+    if not SQLITE_WAL:
+        engine = create(url, **options)
+        event.listen(getattr(engine, "sync_engine", engine), "connect", sqlite_pragmas(read_only=False))
+        return engine, engine
+    # SQLite allows one writer at a time; queue writes for one connection rather than for the file lock
+    write_engine = create(url, **{**options, "pool_size": 1, "max_overflow": 0})
+    read_engine = create(url, **options)
+    event.listen(getattr(write_engine, "sync_engine", write_engine), "connect", sqlite_pragmas(read_only=False))
+    event.listen(getattr(read_engine, "sync_engine", read_engine), "connect", sqlite_pragmas(read_only=True))
+    return write_engine, read_engine
+
+class RoutingSession(Session):
+    """Session that reads through the read engine until its transaction writes.
+
+    From the first write (or flush) on, every statement uses the write engine, so a
+    transaction always reads its own changes. Sessions opened with write=True use the
+    writer throughout, for read-then-write work that must not act on a stale read.
+    """
+
+    def __init__(self, *args, read_bind=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_bind = read_bind
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if self.read_bind is None or self.info.get("writer") or self.info.get("writing"):
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["writing"] = True
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.read_bind
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _end_routing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("writing", None)
+
+# Create SQLAlchemy engines
+engine, read_engine = create_engines(create_engine, get_database_url())
+_read_bind = read_engine if read_engine is not engine else None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession, read_bind=_read_bind)
+
+def create_async_session_factory():
+    """Async sessions backed by aiosqlite/asyncpg, or None when the drivers are unavailable"""
+    if DB_ASYNC == 'off':
+        return None
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+        # aiosqlite defaults to NullPool; pool it like every other engine
+        async_engine, async_read_engine = create_engines(
+            create_async_engine,
+            get_async_database_url(),
+            poolclass=AsyncAdaptedQueuePool
+        )
+    except (ImportError, ValueError) as e:
+        if DB_ASYNC == 'on':
+            raise
+        print(f"Async database driver unavailable ({e}), running database calls in a thread pool")
+        return None
+    async_engines.extend({async_engine, async_read_engine})
+    return async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+        sync_session_class=RoutingSession,
+        read_bind=async_read_engine.sync_engine if async_read_engine is not async_engine else None
+    )
+
+# Kept for dispose_engines()
+async_engines = []
+AsyncSessionLocal = create_async_session_factory()
+# Objects stay usable after commit, matching AsyncSession, so attribute access never hits the database
+ThreadedSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine, class_=RoutingSession, read_bind=_read_bind
+)
+
+class ThreadedSession:
+    """AsyncSession-compatible wrapper that runs a sync Session's database calls in a thread pool"""
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    async def execute(self, statement, params=None, **kwargs):
+        # Buffer rows in the worker thread so reading the result never blocks the event loop
+        kwargs["execution_options"] = {**kwargs.get("execution_options", {}), "prebuffer_rows": True}
+        return await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        self.sync_session.delete(instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
 
 @contextmanager
-def get_db():
+def get_db(write: bool = False):
     """Database session context manager"""
     db: Session = SessionLocal()
+    db.info["writer"] = write
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+@asynccontextmanager
+async def get_async_db(write: bool = False):
+    """Async database session context manager for use inside async routes"""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            db.sync_session.info["writer"] = write
+            yield db
+    else:
+        db = ThreadedSession(ThreadedSessionLocal())
+        db.sync_session.info["writer"] = write
+        try:
+            yield db
+        finally:
+            await db.close()
+
+async def dispose_engines():
+    """Close pooled connections; aiosqlite connections each hold a non-daemon thread"""
+    for async_engine in async_engines:
+        await async_engine.dispose()
+    engine.dispose()
+    read_engine.dispose()
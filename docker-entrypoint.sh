@@ -30,6 +30,6 @@ fi
 echo "Running database migrations..."
 alembic upgrade head
 
-# Start the application
+# Start the application (WEB_WORKERS processes, drained gracefully on docker stop)
 echo "Starting application..."
-exec uvicorn main:app --host 0.0.0.0 --port 8000 
\ No newline at end of file
+exec python serve.py --host 0.0.0.0 --port 8000 
\ No newline at end of file
@@ -0,0 +1,335 @@
+import os
+import stat
+import secrets
+import typing
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Message, Scope, Receive, Send
+
+# Most clients ask for a handful of ranges; anything beyond this is treated as abuse
+MAX_RANGES = 32
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(value: str, size: int) -> typing.Optional[typing.List[typing.Tuple[int, int]]]:
+    """Parse a Range header into sorted, merged half-open (start, end) byte ranges.
+
+    Returns None when the header is malformed or uses another unit, in which case
+    the Range header must be ignored and the full body served.
+    """
+    unit, _, specs = value.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        first, sep, last = spec.partition("-")
+        if not sep:
+            return None
+        try:
+            if first.strip():
+                start = int(first)
+                end = int(last) + 1 if last.strip() else size
+            else:
+                # Suffix range: the last N bytes
+                suffix = int(last)
+                if suffix == 0:
+                    continue
+                start, end = max(size - suffix, 0), size
+        except ValueError:
+            return None
+        if start < 0 or end <= start:
+            if end < start and first.strip() and last.strip():
+                return None
+            continue
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison as required for If-None-Match"""
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ContentFileResponse(Response):
+    """Serve a file with a content-hash ETag, conditional GET and single/multi-range support.
+
+    Bodies are handed to the server with the ASGI zero-copy (sendfile) or pathsend
+    extensions when available, and streamed in large chunks otherwise.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        content_hash: typing.Optional[str] = None,
+        filename: typing.Optional[str] = None,
+        media_type: str = "application/octet-stream",
+        content_disposition_type: str = "attachment",
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        size: typing.Optional[int] = None,
+        mtime: typing.Optional[float] = None,
+        on_complete: typing.Optional[typing.Callable[[int, int], None]] = None,
+    ) -> None:
+        self.path = path
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.content_hash = content_hash
+        # When size and mtime are known (e.g. stored in the database) the file is never stat()ed
+        self.size = size
+        self.mtime = mtime
+        # Called with the status and body bytes once a successful response has been sent in full
+        self.on_complete = on_complete
+        self.init_headers(headers)
+        self.headers.setdefault("accept-ranges", "bytes")
+
+        disposition = content_disposition_type
+        if filename is not None:
+            quoted = quote(filename)
+            if quoted != filename:
+                disposition = f"{content_disposition_type}; filename*=utf-8''{quoted}"
+            else:
+                disposition = f'{content_disposition_type}; filename="{filename}"'
+        self.headers.setdefault("content-disposition", disposition)
+
+    def _validators(self, size: int, mtime: float):
+        if self.content_hash:
+            etag = f'"{self.content_hash}"'
+        else:
+            etag = f'W/"{size:x}-{int(mtime):x}"'
+        return etag, formatdate(mtime, usegmt=True)
+
+    def _not_modified(self, request_headers: Headers, etag: str, mtime: float) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, etag)
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _if_range_allows(self, if_range: str, etag: str, last_modified: str) -> bool:
+        if_range = if_range.strip()
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            # If-Range requires a strong comparison
+            return not etag.startswith("W/") and if_range == etag
+        return if_range == last_modified
+
+    async def _resolve_stat(self) -> bool:
+        """Fill in size and mtime from the file when they were not given; False if there is no file"""
+        if self.size is not None and self.mtime is not None:
+            return True
+        try:
+            stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        except FileNotFoundError:
+            return False
+        if not stat.S_ISREG(stat_result.st_mode):
+            return False
+        self.size, self.mtime = stat_result.st_size, stat_result.st_mtime
+        return True
+
+    def _requested_ranges(self, method: str, request_headers: Headers, size: int, etag: str, last_modified: str):
+        """The byte ranges to send, or None for the whole file; raises RangeNotSatisfiable"""
+        http_range = request_headers.get("range")
+        if not http_range or method not in ("GET", "HEAD"):
+            return None
+        if_range = request_headers.get("if-range")
+        if if_range is not None and not self._if_range_allows(if_range, etag, last_modified):
+            return None
+        return parse_range_header(http_range, size)
+
+    async def sends_from_start(self, scope: Scope) -> bool:
+        """Whether this response will send the file body from its first byte.
+
+        Decided with the validators this response actually serves, so revalidations (304 by
+        ETag or date), HEAD, seeks and resumes all answer False.
+        """
+        method = scope["method"].upper()
+        if method == "HEAD" or not await self._resolve_stat():
+            return False
+        etag, last_modified = self._validators(self.size, self.mtime)
+        request_headers = Headers(scope=scope)
+        if method == "GET" and self._not_modified(request_headers, etag, self.mtime):
+            return False
+        try:
+            ranges = self._requested_ranges(method, request_headers, self.size, etag, last_modified)
+        except RangeNotSatisfiable:
+            return False
+        return not ranges or ranges[0][0] == 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        method = scope["method"].upper()
+        send_header_only = method == "HEAD"
+        if self.on_complete is not None and not send_header_only:
+            send = self._tracking_send(send)
+
+        if not await self._resolve_stat():
+            await Response("File not found", status_code=404)(scope, receive, send)
+            return
+        size, mtime = self.size, self.mtime
+
+        etag, last_modified = self._validators(size, mtime)
+        self.headers["etag"] = etag
+        self.headers["last-modified"] = last_modified
+
+        request_headers = Headers(scope=scope)
+        if method in ("GET", "HEAD") and self._not_modified(request_headers, etag, mtime):
+            await self._send_not_modified(send)
+            return
+
+        try:
+            ranges = self._requested_ranges(method, request_headers, size, etag, last_modified)
+        except RangeNotSatisfiable:
+            response = Response(
+                status_code=416,
+                headers={"content-range": f"bytes */{size}", "accept-ranges": "bytes"}
+            )
+            await response(scope, receive, send)
+            return
+
+        extensions = scope.get("extensions") or {}
+        if send_header_only:
+            file = None
+        else:
+            try:
+                file = await anyio.open_file(self.path, mode="rb")
+            except FileNotFoundError:
+                await Response("File not found", status_code=404)(scope, receive, send)
+                return
+
+        try:
+            if not ranges:
+                self.headers["content-length"] = str(size)
+                await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+                if send_header_only:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                elif "http.response.pathsend" in extensions:
+                    await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+                else:
+                    await self._send_ranges(send, extensions, file, [(0, size)], None, None)
+            elif len(ranges) == 1:
+                start, end = ranges[0]
+                self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+                self.headers["content-length"] = str(end - start)
+                await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+                if send_header_only:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                else:
+                    await self._send_ranges(send, extensions, file, ranges, None, None)
+            else:
+                boundary = secrets.token_hex(13)
+                part_headers = {
+                    (start, end): (
+                        f"--{boundary}\r\n"
+                        f"Content-Type: {self.media_type}\r\n"
+                        f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n"
+                    ).encode("latin-1")
+                    for start, end in ranges
+                }
+                closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+                content_length = sum(len(part_headers[r]) + r[1] - r[0] + 2 for r in ranges) - 2 + len(closing)
+                self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+                self.headers["content-length"] = str(content_length)
+                await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+                if send_header_only:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                else:
+                    await self._send_ranges(send, extensions, file, ranges, part_headers, closing)
+        finally:
+            if file is not None:
+                await file.aclose()
+
+    def _tracking_send(self, send: Send) -> Send:
+        state = {"status": 200, "length": 0, "sent": 0}
+
+        async def tracking_send(message: Message) -> None:
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                state["status"] = message["status"]
+                state["length"] = int(Headers(raw=message["headers"]).get("content-length") or 0)
+            elif message_type == "http.response.body":
+                state["sent"] += len(message.get("body", b""))
+            elif message_type == "http.response.zerocopy":
+                state["sent"] += message["count"]
+            elif message_type == "http.response.pathsend":
+                state["sent"] += state["length"]
+            await send(message)
+            if message_type != "http.response.start" and not message.get("more_body", False):
+                if state["status"] < 400:
+                    self.on_complete(state["status"], state["sent"])
+
+        return tracking_send
+
+    async def _send_not_modified(self, send: Send) -> None:
+        # 304 responses carry the validators and caching headers but no body or content headers
+        headers = [
+            (key, value) for key, value in self.raw_headers
+            if key not in (b"content-length", b"content-type", b"content-disposition")
+        ]
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_ranges(self, send: Send, extensions, file, ranges, part_headers, closing) -> None:
+        zerocopy = "http.response.zerocopy" in extensions
+        for i, (start, end) in enumerate(ranges):
+            if part_headers:
+                prefix = part_headers[(start, end)] if i == 0 else b"\r\n" + part_headers[(start, end)]
+                await send({"type": "http.response.body", "body": prefix, "more_body": True})
+
+            if zerocopy:
+                # The server calls os.sendfile() on our descriptor, so the body never enters userspace
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": file.wrapped,
+                    "offset": start,
+                    "count": end - start,
+                    "more_body": True,
+                })
+            else:
+                await file.seek(start)
+                while start < end:
+                    chunk = await file.read(min(self.chunk_size, end - start))
+                    if not chunk:
+                        break
+                    start += len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+        await send({"type": "http.response.body", "body": closing or b"", "more_body": False})
@@ -0,0 +1,64 @@
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from sqlalchemy import select
+from dotenv import load_dotenv
+from models import Link
+from database import get_async_db
+
+load_dotenv()
+
+# Link metadata cache configuration
+LINK_CACHE_TTL = int(os.getenv("LINK_CACHE_TTL", 30))  # seconds; bounds staleness across workers
+LINK_CACHE_SIZE = int(os.getenv("LINK_CACHE_SIZE", 10000))
+
+
+class LinkMeta(NamedTuple):
+    is_public: bool
+    has_password: bool
+    file_path: str
+
+
+# Cached marker for links that do not exist, so probing unknown links stays cheap too
+_MISSING = object()
+
+
+class LinkMetadataCache:
+    """Small in-process LRU of the link fields middleware needs, with TTL and explicit invalidation"""
+
+    def __init__(self, ttl: int = LINK_CACHE_TTL, max_entries: int = LINK_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, custom_link: str) -> Optional[LinkMeta]:
+        entry = self._entries.get(custom_link)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(custom_link)
+            return None if entry[1] is _MISSING else entry[1]
+
+        async with get_async_db() as db:
+            row = (await db.execute(
+                select(Link.is_public, Link.file_password, Link.file_path).where(Link.custom_link == custom_link)
+            )).first()
+
+        meta = LinkMeta(row.is_public, bool(row.file_password), row.file_path) if row else None
+        self._entries[custom_link] = (time.monotonic() + self.ttl, _MISSING if meta is None else meta)
+        self._entries.move_to_end(custom_link)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return meta
+
+    def invalidate(self, *custom_links: str):
+        """Forget the given links, or everything when called without arguments"""
+        if not custom_links:
+            self._entries.clear()
+        for custom_link in custom_links:
+            self._entries.pop(custom_link, None)
+
+
+link_cache = LinkMetadataCache()
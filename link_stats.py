@@ -0,0 +1,160 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from sqlalchemy import BigInteger, DateTime, Integer, bindparam, case, delete, select
+from dotenv import load_dotenv
+from models import Link, LinkStats
+from database import DB_TYPE, get_async_db
+
+load_dotenv()
+
+# Download statistics configuration
+LINK_STATS_ENABLED = os.getenv("LINK_STATS_ENABLED", "true").lower() == "true"
+LINK_STATS_FLUSH_INTERVAL = int(os.getenv("LINK_STATS_FLUSH_INTERVAL", 10))  # seconds; at most this much is lost on a crash
+LINK_STATS_FLUSH_SIZE = int(os.getenv("LINK_STATS_FLUSH_SIZE", 1000))  # links with pending counts that trigger an early flush
+# While the database is unreachable, links beyond this many are not tracked so memory stays bounded
+LINK_STATS_MAX_PENDING = LINK_STATS_FLUSH_SIZE * 10
+
+
+def upsert_stats():
+    """Statement adding one link's deltas to its stored statistics, run with many parameter sets.
+
+    Rows are only written for links that still exist: a worker flushing after another deleted
+    the link must not bring its statistics back, or hand them to a new link that reuses the id.
+    On Postgres the link row is also locked, so a concurrent delete either waits for this write
+    (and then deletes the statistics) or has already removed the link and nothing is inserted.
+    """
+    if DB_TYPE == 'postgres':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    source = (
+        select(
+            Link.id,
+            bindparam("downloads", type_=BigInteger),
+            bindparam("bytes_sent", type_=BigInteger),
+            bindparam("last_accessed_at", type_=DateTime),
+        )
+        .where(Link.id == bindparam("link_id", type_=Integer))
+        .with_for_update(read=True, key_share=True, of=Link)
+    )
+    # The table rather than the entity, so a list of parameter sets is a plain executemany, not an ORM bulk insert
+    stmt = insert(LinkStats.__table__).from_select(["link_id", "downloads", "bytes_sent", "last_accessed_at"], source)
+    return stmt.on_conflict_do_update(
+        index_elements=[LinkStats.link_id],
+        set_={
+            "downloads": LinkStats.downloads + stmt.excluded.downloads,
+            "bytes_sent": LinkStats.bytes_sent + stmt.excluded.bytes_sent,
+            "last_accessed_at": case(
+                (LinkStats.last_accessed_at.is_(None), stmt.excluded.last_accessed_at),
+                (stmt.excluded.last_accessed_at > LinkStats.last_accessed_at, stmt.excluded.last_accessed_at),
+                else_=LinkStats.last_accessed_at
+            ),
+        }
+    )
+
+
+class PendingStats:
+    __slots__ = ("downloads", "bytes_sent", "last_accessed_at")
+
+    def __init__(self):
+        self.downloads = 0
+        self.bytes_sent = 0
+        self.last_accessed_at: Optional[datetime] = None
+
+    def merge(self, other: "PendingStats"):
+        self.downloads += other.downloads
+        self.bytes_sent += other.bytes_sent
+        if other.last_accessed_at and (not self.last_accessed_at or other.last_accessed_at > self.last_accessed_at):
+            self.last_accessed_at = other.last_accessed_at
+
+
+class LinkStatsBuffer:
+    """Collects download events in memory and writes them as aggregated deltas in one batched upsert.
+
+    Every worker adds its own deltas, so counts stay correct with any number of workers.
+    """
+
+    def __init__(self, flush_size: int = LINK_STATS_FLUSH_SIZE, max_pending: int = LINK_STATS_MAX_PENDING):
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+        self._pending: Dict[int, PendingStats] = {}
+        self._flush_task = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, link_id: int, status_code: int, bytes_sent: int, download: bool = True):
+        """Called once a response body has been sent completely; a 200 counts as a download unless download=False"""
+        if not LINK_STATS_ENABLED:
+            return
+        entry = self._pending.get(link_id)
+        if entry is None:
+            if len(self._pending) >= self.max_pending:
+                return
+            entry = self._pending[link_id] = PendingStats()
+        if download and status_code == 200:
+            entry.downloads += 1
+        entry.bytes_sent += bytes_sent
+        entry.last_accessed_at = datetime.utcnow()
+
+        if len(self._pending) >= self.flush_size and self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_early())
+
+    async def _flush_early(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Failed to flush link stats: {e}")
+        finally:
+            self._flush_task = None
+
+    def pending(self, link_id: int) -> Optional[PendingStats]:
+        """Counts not yet written, so this worker's pages show them straight away"""
+        return self._pending.get(link_id)
+
+    def pending_downloads(self) -> Dict[int, int]:
+        """Downloads not yet written, by link"""
+        return {link_id: entry.downloads for link_id, entry in self._pending.items() if entry.downloads}
+
+    def discard(self, link_ids: Iterable[int]):
+        for link_id in link_ids:
+            self._pending.pop(link_id, None)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        rows = [
+            {
+                "link_id": link_id,
+                "downloads": entry.downloads,
+                "bytes_sent": entry.bytes_sent,
+                "last_accessed_at": entry.last_accessed_at,
+            }
+            for link_id, entry in pending.items()
+        ]
+        try:
+            async with get_async_db() as db:
+                await db.execute(upsert_stats(), rows)
+                await db.commit()
+        except Exception:
+            # Keep the deltas for the next attempt, merged with anything recorded meanwhile
+            for link_id, entry in pending.items():
+                current = self._pending.get(link_id)
+                if current is None:
+                    self._pending[link_id] = entry
+                else:
+                    current.merge(entry)
+            raise
+
+
+async def delete_link_stats(db, link_ids: Iterable[int]):
+    """Drop the statistics of deleted links; the caller commits"""
+    link_ids = list(link_ids)
+    link_stats.discard(link_ids)
+    await db.execute(delete(LinkStats).where(LinkStats.link_id.in_(link_ids)))
+
+
+link_stats = LinkStatsBuffer()
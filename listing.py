@@ -0,0 +1,142 @@
+import os
+import json
+import operator
+import base64
+from collections import OrderedDict
+from typing import Optional, Tuple
+from sqlalchemy import select, func, union_all
+from sqlalchemy.orm import lazyload
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+from models import Link, CatalogVersion
+
+load_dotenv()
+
+# Listing API configuration
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", 50))  # links per page unless ?limit= asks otherwise
+LIST_MAX_PAGE_SIZE = 500
+LIST_CACHE_SIZE = int(os.getenv("LIST_CACHE_SIZE", 256))  # rendered pages kept per worker
+
+# Sort keys by name; each is paired with the id so the order is total. Ids are handed out in
+# insertion order, so they order links by creation time through the primary key. The size key
+# matches the ix_links_size_sort expression index; rows without a recorded size sort first.
+SORT_KEYS = {
+    "created_at": Link.id,
+    "size": func.coalesce(Link.size, -1),
+    "name": Link.custom_link,
+}
+VISIBILITY_FILTERS = {"all": None, "public": True, "private": False}
+
+
+def encode_cursor(value, link_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, link_id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[object, int]:
+    """Raises ValueError for cursors that were not produced by encode_cursor for this sort key"""
+    try:
+        value, link_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Malformed cursor")
+    if not isinstance(link_id, int):
+        raise ValueError("Malformed cursor")
+    if sort in ("created_at", "size") and not isinstance(value, int):
+        raise ValueError("Malformed cursor")
+    elif sort == "name" and not isinstance(value, str):
+        raise ValueError("Malformed cursor")
+    return value, link_id
+
+
+async def catalog_version(db: AsyncSession) -> int:
+    """Changes whenever a link changes, in any worker or process; download statistics do not count"""
+    return await db.scalar(select(CatalogVersion.version).where(CatalogVersion.id == 1)) or 0
+
+
+def link_json(link: Link) -> dict:
+    # Catalog fields only, so a page stays valid until a link changes; statistics come from /stats
+    return {
+        "custom_link": link.custom_link,
+        "filename": link.filename,
+        "size": link.size,
+        "mime_type": link.mime_type,
+        "created_at": link.created_at.isoformat(),
+        "is_public": link.is_public,
+        "has_password": bool(link.file_password),
+        "expires_at": link.expires_at.isoformat() if link.expires_at else None,
+        "max_downloads": link.max_downloads,
+        "download_count": link.download_count,
+        "download_url": f"/download/{link.custom_link}",
+    }
+
+
+def page_query(sort: str, descending: bool, visibility: str, after: Optional[Tuple[object, int]], limit: int):
+    key = SORT_KEYS[sort]
+    ordering = (key.desc(), Link.id.desc()) if descending else (key.asc(), Link.id.asc())
+
+    def visible(query):
+        if VISIBILITY_FILTERS[visibility] is None:
+            return query
+        return query.where(Link.is_public == VISIBILITY_FILTERS[visibility])
+
+    # The listing never touches the blob, so skip its joined load
+    query = select(Link).options(lazyload(Link.blob))
+    # One extra row tells whether there is a next page
+    if after is None:
+        return visible(query).order_by(*ordering).limit(limit + 1)
+
+    # Rows tied with the cursor's key, then rows past it. As one OR the planner only seeks on the key
+    # and walks every tie (many links share a size); as two branches each is an index range that
+    # stops after limit + 1 rows
+    value, link_id = after
+    past = operator.lt if descending else operator.gt
+    ties = visible(select(Link.id).where(key == value, past(Link.id, link_id))).order_by(ordering[1])
+    rest = visible(select(Link.id).where(past(key, value))).order_by(*ordering)
+    branches = [branch.limit(limit + 1).subquery() for branch in (ties, rest)]
+    page = union_all(*(select(branch.c.id) for branch in branches)).subquery()
+    return query.join(page, page.c.id == Link.id).order_by(*ordering).limit(limit + 1)
+
+
+async def list_links(
+    db: AsyncSession,
+    sort: str = "created_at",
+    descending: bool = True,
+    visibility: str = "all",
+    cursor: Optional[str] = None,
+    limit: int = LIST_PAGE_SIZE
+) -> dict:
+    """One page of links; pass the returned next_cursor to get the following page"""
+    after = decode_cursor(cursor, sort) if cursor else None
+    links = (await db.scalars(page_query(sort, descending, visibility, after, limit))).all()
+    next_cursor = None
+    if len(links) > limit:
+        links = links[:limit]
+        last = links[-1]
+        value = {"created_at": last.id, "size": -1 if last.size is None else last.size, "name": last.custom_link}[sort]
+        next_cursor = encode_cursor(value, last.id)
+    return {"links": [link_json(link) for link in links], "next_cursor": next_cursor}
+
+
+class ListingCache:
+    """Rendered pages keyed by catalog version and query, so unchanged pages are never queried twice"""
+
+    def __init__(self, max_entries: int = LIST_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def put(self, key, body: bytes):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+listing_cache = ListingCache()
@@ -1,26 +1,94 @@
-from fastapi import FastAPI, Request, Form, File, UploadFile, HTTPException, Depends, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import FastAPI, Request, Form, File, UploadFile, HTTPException, Depends, Query, status
+from starlette.datastructures import Headers, UploadFile as FormFile
+from starlette.types import ASGIApp, Scope, Receive, Send
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from fastapi.responses import RedirectResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
-from typing import Optional
+from typing import Optional, List, Tuple
 import secrets
 import os
-from datetime import datetime, timedelta
+import json
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import time
+import asyncio
 import mimetypes
+import fcntl
+from sqlalchemy import select, update, not_
 from sqlalchemy.orm import Session
-from models import Link
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from models import Link, LinkStats, LinkVersionCounter, UploadSession
+from database import get_db, get_async_db, dispose_engines
+from link_cache import link_cache
+from link_stats import LINK_STATS_FLUSH_INTERVAL, delete_link_stats, link_stats
+from listing import (
+    LIST_PAGE_SIZE,
+    LIST_MAX_PAGE_SIZE,
+    SORT_KEYS,
+    VISIBILITY_FILTERS,
+    catalog_version,
+    list_links,
+    listing_cache,
+)
+from search import SEARCH_LIMIT, SEARCH_MAX_LIMIT, search_links
+from metrics import METRICS_PUBLIC, CallbackGauge, MetricsMiddleware, render_metrics
+from sessions import SESSION_FLUSH_INTERVAL, create_session_store, session_key
+from storage import (
+    UPLOAD_DIR,
+    ensure_upload_dir,
+    StagedUpload,
+    stage_upload,
+    stage_stream,
+    check_upload_size,
+    check_multipart_length,
+    hash_file,
+    blob_path,
+    acquire_blob,
+    place_blob,
+    release_blob,
+    remove_blob,
+    VARIANT_SUFFIXES,
+)
+from compression import schedule_compression, choose_encoding
+from previews import preview_builder, remove_previews, RENDITIONS
+from file_response import ContentFileResponse, etag_matches
+from static_assets import static_files, static_url
+from reconcile import RECONCILE_INTERVAL, reconcile_storage
+from archive import ArchiveEntry, missing_entries, stream_zip, unique_names
+from access import (
+    ACCESS_TOKEN_TTL,
+    issue_access_token,
+    verify_access_token,
+    access_cookie_name,
+    verify_password,
+    hash_password,
+)
+from resumable import (
+    RESUMABLE_CHUNK_SIZE,
+    RESUMABLE_MAX_CHUNK_SIZE,
+    RESUMABLE_SESSION_TTL,
+    create_session_files,
+    remove_session_files,
+    write_chunk,
+    received_chunks,
+    received_ranges,
+    stage_session,
+    expire_upload_sessions,
+)
 
 # Load environment variables
 load_dotenv()
 
 # Define constants with environment variable support
-UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")  # Use custom path from .env or default to "uploads"
+# UPLOAD_DIR is configured in storage.py (defaults to "uploads")
 SESSION_TIMEOUT = 30 * 60  # 30 minutes in seconds
+RESUMABLE_SWEEP_INTERVAL = 15 * 60  # check for abandoned resumable uploads every 15 minutes
+BATCH_MAX_LINKS = int(os.getenv("BATCH_MAX_LINKS", 1000))  # links or files per batch request
+LINK_SWEEP_INTERVAL = int(os.getenv("LINK_SWEEP_INTERVAL", 60))  # seconds between expired-link sweeps
+LINK_SWEEP_BATCH = int(os.getenv("LINK_SWEEP_BATCH", 100))  # links deleted per transaction
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", 2))  # seconds /readyz waits for the database
 USERNAME = os.getenv("ADMIN_USERNAME")
 PASSWORD = os.getenv("ADMIN_PASSWORD")
 
@@ -28,18 +96,8 @@ PASSWORD = os.getenv("ADMIN_PASSWORD")
 if not USERNAME or not PASSWORD:
     raise Exception("Missing required environment variables. Please check your .env file.")
 
-last_activity = {}
-
-def ensure_upload_dir():
-    """Create the upload directory if it doesn't exist"""
-    try:
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        print(f"Upload directory confirmed: {os.path.abspath(UPLOAD_DIR)}")
-    except Exception as e:
-        raise Exception(f"Failed to create upload directory: {e}")
-
-# Ensure upload directory exists
-ensure_upload_dir()
+# Last activity per admin session (see sessions.py; SESSION_STORE=database shares it across workers)
+session_store = create_session_store(SESSION_TIMEOUT)
 
 app = FastAPI()
 
@@ -120,124 +178,589 @@ def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
 
 # Template setup
 templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-class SessionTimeoutMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Skip session check for public files and login
-        if "download" in request.url.path:
-            path_parts = request.url.path.split('/')
-            if len(path_parts) >= 3:  # Ensure we have enough parts in the path
-                custom_link = path_parts[-2]
-                with get_db() as db:
-                    link = db.query(Link).filter(Link.custom_link == custom_link).first()
-                    if link and link.is_public:  # If file is public
-                        return await call_next(request)
-
-        # Check for credentials
-        auth = request.headers.get('Authorization')
-        if auth:
+templates.env.globals["static_url"] = static_url
+app.mount("/static", static_files, name="static")
+
+def download_link_from_path(path: str) -> Optional[str]:
+    """The custom_link segment of a /download/{custom_link}[/...] path"""
+    path_parts = path.strip('/').split('/')
+    if len(path_parts) >= 2 and path_parts[0] == "download":
+        return path_parts[1]
+    return None
+
+class SessionTimeoutMiddleware:
+    """Pure ASGI middleware, so response bodies (large downloads) pass through untouched"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # Skip session check for public files; visibility comes from the link cache, not a query
+        custom_link = download_link_from_path(scope["path"])
+        if custom_link:
+            link = await link_cache.get(custom_link)
+            if link and link.is_public:  # If file is public
+                return await self.app(scope, receive, send)
+
+        # Check for credentials; scripted uploads authenticate on every request and have no idle session
+        auth = Headers(scope=scope).get('Authorization')
+        if auth and not scope["path"].startswith("/api/files/"):
             current_time = time.time()
+            key = session_key(auth)
             
-            if auth in last_activity:
-                time_elapsed = current_time - last_activity[auth]
+            last_seen = await session_store.last_seen(key)
+            if last_seen is not None:
+                time_elapsed = current_time - last_seen
                 if time_elapsed > SESSION_TIMEOUT:
-                    last_activity.pop(auth, None)
-                    return RedirectResponse(
+                    await session_store.remove(key)
+                    response = RedirectResponse(
                         url="/logout",
                         status_code=303
                     )
+                    return await response(scope, receive, send)
             
-            last_activity[auth] = current_time
+            session_store.touch(key, current_time)
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 # Add the middleware to the app
 app.add_middleware(SessionTimeoutMiddleware)
+# Added last so it is outermost and times the whole request
+app.add_middleware(MetricsMiddleware)
+
+CallbackGauge("admin_sessions", "Admin sessions tracked by this worker's session store", lambda: len(session_store))
+CallbackGauge("link_cache_entries", "Entries in this worker's link metadata cache", lambda: len(link_cache))
+CallbackGauge("listing_cache_entries", "Listing pages cached by this worker", lambda: len(listing_cache))
+CallbackGauge("link_stats_pending", "Links with download statistics not yet written by this worker", lambda: len(link_stats))
+
+async def get_link(db: AsyncSession, custom_link: str) -> Optional[Link]:
+    return await db.scalar(select(Link).where(Link.custom_link == custom_link))
+
+def stats_info(link_id: int, stats: Optional[LinkStats]) -> dict:
+    """Stored statistics plus this worker's counts that have not been written yet"""
+    downloads = stats.downloads if stats else 0
+    bytes_sent = stats.bytes_sent if stats else 0
+    last_accessed_at = stats.last_accessed_at if stats else None
+    pending = link_stats.pending(link_id)
+    if pending:
+        downloads += pending.downloads
+        bytes_sent += pending.bytes_sent
+        last_accessed_at = max(filter(None, [last_accessed_at, pending.last_accessed_at]), default=None)
+    return {"downloads": downloads, "bytes_sent": bytes_sent, "last_accessed_at": last_accessed_at}
 
 @app.get("/")
 def home(request: Request, credentials: HTTPBasicCredentials = Depends(verify_credentials)):
-    with get_db() as db:
-        # Get all links using SQLAlchemy
-        files = db.query(Link).all()
-        
-        files_info = []
-        for link in files:
-            if os.path.exists(link.file_path):
-                size = os.path.getsize(link.file_path)
-                if size < 1024:
-                    size_str = f"{size} B"
-                elif size < 1024 * 1024:
-                    size_str = f"{size/1024:.1f} KB"
-                else:
-                    size_str = f"{size/(1024*1024):.1f} MB"
-                    
-                files_info.append({
-                    "custom_link": link.custom_link,
-                    "filename": os.path.basename(link.file_path),
-                    "size": size_str,
-                    "created_at": link.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                    "is_public": link.is_public,
-                    "download_url": f"/download/{link.custom_link}"
-                })
-        
-        return templates.TemplateResponse(
-            "index.html", 
-            {"request": request, "files": files_info}
-        )
+    # Only the page shell; rows are fetched from /api/links a page at a time as the table scrolls
+    return templates.TemplateResponse(
+        "index.html", 
+        {"request": request, "page_size": LIST_PAGE_SIZE}
+    )
 
-@app.post("/upload/")
-async def upload_file(
-    request: Request,
-    custom_link: str = Form(...),
-    file: UploadFile = File(...),
-    is_public: bool = Form(False),
-    file_password: str = Form(None),
-    credentials: HTTPBasicCredentials = Depends(verify_credentials)
-):
+async def allocate_version(db: AsyncSession, base_link: str) -> int:
+    """Atomically take the next archive version number for a link; one UPDATE however many versions exist"""
+    result = await db.execute(
+        update(LinkVersionCounter)
+        .where(LinkVersionCounter.base_link == base_link)
+        .values(last_version=LinkVersionCounter.last_version + 1)
+    )
+    if not result.rowcount:
+        # First re-upload of this link; a concurrent insert raises IntegrityError and is retried
+        db.add(LinkVersionCounter(base_link=base_link, last_version=1))
+        await db.flush()
+        return 1
+    # The UPDATE holds the row (or database) lock until commit, so this read sees our own increment
+    return await db.scalar(
+        select(LinkVersionCounter.last_version).where(LinkVersionCounter.base_link == base_link)
+    )
+
+async def delete_links(db: AsyncSession, links: List[Link]):
+    """Delete link rows, then remove any stored files that nothing references any more"""
+    for link in links:
+        await db.delete(link)
+    await delete_link_stats(db, [link.id for link in links])
+    await db.flush()
+
+    orphaned_blobs = []
+    for link in links:
+        if link.blob_sha256 and await release_blob(db, link.blob_sha256):
+            orphaned_blobs.append(link.blob_sha256)
+    await db.commit()
+    link_cache.invalidate(*[link.custom_link for link in links])
+
+    # Blobs are only removed once nothing references them
+    for sha256 in orphaned_blobs:
+        await remove_blob(db, sha256)
+        remove_previews(sha256)
+    for link in links:
+        # Files from before the blob store may still be shared by another link
+        if link.blob_sha256 or not os.path.exists(link.file_path):
+            continue
+        if not await db.scalar(select(Link.id).where(Link.file_path == link.file_path).limit(1)):
+            os.remove(link.file_path)
+            if link.content_hash:
+                remove_previews(link.content_hash)
+
+def positive_int(value: Optional[str], name: str) -> Optional[int]:
+    """Optional positive integer form field; empty values (e.g. an unset <select>) mean no limit"""
+    if value is None or not value.strip():
+        return None
     try:
-        with get_db() as db:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise HTTPException(status_code=400, detail=f"{name} must be a positive whole number")
+    return number
+
+def link_limits(expires_in: Optional[str], max_downloads: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Parse the upload-time limits: a TTL in seconds and a download quota"""
+    return positive_int(expires_in, "expires_in"), positive_int(max_downloads, "max_downloads")
+
+def expiry_time(ttl: Optional[int]) -> Optional[datetime]:
+    return datetime.utcnow() + timedelta(seconds=ttl) if ttl else None
+
+async def publish_upload(
+    db: AsyncSession,
+    custom_link: str,
+    filename: str,
+    staged: StagedUpload,
+    is_public: bool,
+    password_hash: Optional[str],
+    expires_at: Optional[datetime] = None,
+    max_downloads: Optional[int] = None
+) -> Link:
+    """Create the link row for a staged upload, archiving any existing link as a version"""
+    # A concurrent upload of the same content or link name shows up as an IntegrityError; retry once
+    for attempt in range(2):
+        try:
             # Check if custom_link already exists
-            existing = db.query(Link).filter(Link.custom_link == custom_link).first()
+            existing = await get_link(db, custom_link)
             
             if existing:
-                # Create a versioned custom_link for the existing file
-                version = 1
+                # Archive the existing file under the next version number from the link's counter;
+                # a name is only skipped if someone uploaded a link literally called "{link}-vN"
                 while True:
+                    version = await allocate_version(db, custom_link)
                     versioned_link = f"{custom_link}-v{version}"
-                    if not db.query(Link).filter(Link.custom_link == versioned_link).first():
+                    if not await get_link(db, versioned_link):
                         break
-                    version += 1
                     
                 # Rename the existing entry to include version
                 existing.custom_link = versioned_link
-                db.commit()
+                existing.base_link = custom_link
+                existing.version = version
+                await db.flush()
             
-            # Save the new file
-            file_path = os.path.join(UPLOAD_DIR, file.filename)
-            contents = await file.read()
-            with open(file_path, "wb") as f:
-                f.write(contents)
-
-            # Create new link with hashed password
+            await acquire_blob(db, staged.sha256, staged.size)
             new_link = Link(
                 custom_link=custom_link,
-                file_path=file_path,
+                base_link=custom_link,
+                file_path=blob_path(staged.sha256),
+                filename=os.path.basename(filename),
+                blob_sha256=staged.sha256,
                 is_public=is_public,
-                file_password=Link.hash_password(file_password)
+                file_password=password_hash,
+                content_hash=staged.sha256,
+                size=staged.size,
+                mime_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                file_mtime=datetime.utcnow(),
+                expires_at=expires_at,
+                max_downloads=max_downloads
             )
             db.add(new_link)
-            db.commit()
+            await db.commit()
+            link_cache.invalidate(custom_link, *([versioned_link] if existing else []))
+            break
+        except IntegrityError:
+            await db.rollback()
+            if attempt:
+                raise
+
+    # Only move the file into the blob store once its row is committed
+    try:
+        if place_blob(staged):
+            schedule_compression(staged.sha256, new_link.mime_type, new_link.filename, staged.size)
+            preview_builder.warm(new_link.file_path, staged.sha256, new_link.mime_type, new_link.filename, staged.size)
+    except Exception:
+        await db.delete(new_link)
+        await db.flush()
+        await release_blob(db, staged.sha256)
+        await db.commit()
+        link_cache.invalidate(custom_link)
+        raise
 
+    return new_link
+
+@app.post("/upload/")
+async def upload_file(
+    request: Request,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Upload one file from the admin page's multipart form.
+
+    The form is read here rather than through Form()/File() parameters, which FastAPI parses
+    before the route runs: an oversized body is refused from its Content-Length before any of
+    it is spooled to a temp file.
+    """
+    check_multipart_length(request.headers.get("content-length"))
+    async with request.form() as form:
+        custom_link, file = form.get("custom_link"), form.get("file")
+        if not custom_link or not isinstance(file, FormFile):
+            raise HTTPException(status_code=422, detail="custom_link and file are required")
+        staged = None
+        try:
+            is_public = flag_option(form.get("is_public"), "is_public")
+            ttl, max_downloads = link_limits(form.get("expires_in"), form.get("max_downloads"))
+            # Stream the upload to a temp file before touching the database
+            staged = await stage_upload(file)
+
+            async with get_async_db(write=True) as db:
+                # Create new link with hashed password
+                await publish_upload(
+                    db,
+                    custom_link,
+                    file.filename,
+                    staged,
+                    is_public,
+                    await hash_password(form.get("file_password")),
+                    expiry_time(ttl),
+                    max_downloads
+                )
+
+                return RedirectResponse(
+                    url=f"/file/{custom_link}?success=File uploaded successfully",
+                    status_code=303
+                )
+        except Exception as e:
+            if staged:
+                staged.discard()
             return RedirectResponse(
-                url=f"/file/{custom_link}?success=File uploaded successfully",
+                url=f"/?error=Upload failed: {str(e)}",
                 status_code=303
             )
+
+def upload_option(request: Request, name: str) -> Optional[str]:
+    """Raw uploads take their options as X- headers (X-File-Password) or query parameters (?file_password=)"""
+    value = request.headers.get("x-" + name.replace("_", "-"))
+    return value if value is not None else request.query_params.get(name)
+
+def flag_option(value: Optional[str], name: str) -> bool:
+    if value is None or value.strip().lower() in ("", "0", "false", "no", "off"):
+        return False
+    if value.strip().lower() in ("1", "true", "yes", "on"):
+        return True
+    raise HTTPException(status_code=400, detail=f"{name} must be true or false")
+
+@app.put("/api/files/{custom_link}", status_code=201)
+async def put_file(
+    request: Request,
+    custom_link: str,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Upload the raw request body as a file, without multipart encoding.
+
+    Everything is validated before the body is read, so a client sending Expect: 100-continue
+    never transmits a body that would be rejected.
+    """
+    is_public = flag_option(upload_option(request, "is_public"), "is_public")
+    ttl, max_downloads = link_limits(upload_option(request, "expires_in"), upload_option(request, "max_downloads"))
+    filename = upload_option(request, "filename") or custom_link
+    expected_sha256 = upload_option(request, "sha256")
+    content_length = request.headers.get("content-length")
+    if content_length is not None and not content_length.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    password_hash = await hash_password(upload_option(request, "file_password"))
+
+    staged = await stage_stream(request.stream(), int(content_length) if content_length is not None else None)
+    try:
+        if expected_sha256 and expected_sha256.lower() != staged.sha256:
+            raise HTTPException(status_code=422, detail="SHA-256 mismatch, upload is corrupt")
+        async with get_async_db(write=True) as db:
+            await publish_upload(
+                db,
+                custom_link,
+                filename,
+                staged,
+                is_public,
+                password_hash,
+                expiry_time(ttl),
+                max_downloads
+            )
+    except HTTPException:
+        staged.discard()
+        raise
     except Exception as e:
-        return RedirectResponse(
-            url=f"/?error=Upload failed: {str(e)}",
-            status_code=303
+        staged.discard()
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+    return {
+        "custom_link": custom_link,
+        "filename": os.path.basename(filename),
+        "size": staged.size,
+        "sha256": staged.sha256,
+        "download_url": f"/download/{custom_link}"
+    }
+
+def get_upload_session(db: Session, upload_id: str) -> UploadSession:
+    session = db.get(UploadSession, upload_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+def open_upload_session(session: UploadSession) -> dict:
+    with get_db() as db:
+        expire_upload_sessions(db)
+        create_session_files(session.id, session.total_size)
+        db.add(session)
+        db.commit()
+
+        return {
+            "upload_id": session.id,
+            "chunk_size": session.chunk_size,
+            "chunk_count": session.chunk_count,
+            "expires_at": session.expires_at.isoformat()
+        }
+
+@app.post("/uploads")
+async def create_upload_session(
+    custom_link: str = Form(...),
+    filename: str = Form(...),
+    total_size: int = Form(...),
+    chunk_size: int = Form(RESUMABLE_CHUNK_SIZE),
+    is_public: bool = Form(False),
+    file_password: str = Form(None),
+    expires_in: str = Form(None),
+    max_downloads: str = Form(None),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Start a resumable upload; chunks are then PUT to /uploads/{upload_id}/chunks/{index}"""
+    check_upload_size(total_size)
+    ttl, max_downloads = link_limits(expires_in, max_downloads)
+    if total_size < 0 or not 0 < chunk_size <= RESUMABLE_MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail="Invalid total_size or chunk_size")
+
+    # Hashed on the bcrypt pool, then the database and file work runs in a thread as before
+    return await run_in_threadpool(open_upload_session, UploadSession(
+        id=secrets.token_hex(16),
+        custom_link=custom_link,
+        filename=os.path.basename(filename),
+        total_size=total_size,
+        chunk_size=chunk_size,
+        is_public=is_public,
+        file_password=await hash_password(file_password),
+        link_ttl=ttl,
+        max_downloads=max_downloads,
+        expires_at=datetime.utcnow() + timedelta(seconds=RESUMABLE_SESSION_TTL)
+    ))
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def upload_chunk(
+    request: Request,
+    upload_id: str,
+    index: int,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Store one chunk; chunks may arrive in any order and in parallel"""
+    async with get_async_db() as db:
+        session = await db.get(UploadSession, upload_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+
+    await write_chunk(session, index, request.stream())
+    return {"upload_id": upload_id, "index": index, "received": True}
+
+@app.get("/uploads/{upload_id}")
+def upload_session_status(
+    upload_id: str,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Report which byte ranges of the upload are already stored"""
+    with get_db() as db:
+        session = get_upload_session(db, upload_id)
+        chunks = received_chunks(upload_id)
+
+        return {
+            "upload_id": upload_id,
+            "custom_link": session.custom_link,
+            "total_size": session.total_size,
+            "chunk_size": session.chunk_size,
+            "chunk_count": session.chunk_count,
+            "received_ranges": received_ranges(session, chunks),
+            "missing_chunks": sorted(set(range(session.chunk_count)) - set(chunks)),
+            "expires_at": session.expires_at.isoformat()
+        }
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload_session(
+    upload_id: str,
+    sha256: str = Form(None),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Publish a fully received upload as a link"""
+    async with get_async_db() as db:
+        session = await db.get(UploadSession, upload_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+
+    # Hashing a large file takes a while; no connection is held meanwhile, least of all the single writer
+    staged = await stage_session(session)
+    if sha256 and sha256.lower() != staged.sha256:
+        raise HTTPException(status_code=422, detail="SHA-256 mismatch, upload is corrupt")
+
+    async with get_async_db(write=True) as db:
+        # Aborted, expired or completed by a concurrent request while we were hashing
+        session = await db.get(UploadSession, upload_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+
+        await publish_upload(
+            db,
+            session.custom_link,
+            session.filename,
+            staged,
+            session.is_public,
+            session.file_password,
+            expiry_time(session.link_ttl),
+            session.max_downloads
         )
+        await db.delete(session)
+        await db.commit()
+    remove_session_files(upload_id)
+
+    return {
+        "custom_link": session.custom_link,
+        "size": staged.size,
+        "sha256": staged.sha256,
+        "download_url": f"/download/{session.custom_link}"
+    }
+
+@app.delete("/uploads/{upload_id}")
+def abort_upload_session(
+    upload_id: str,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    with get_db() as db:
+        session = get_upload_session(db, upload_id)
+        db.delete(session)
+        db.commit()
+        remove_session_files(upload_id)
+        return {"upload_id": upload_id, "aborted": True}
+
+def expire_upload_sessions_in_new_session():
+    with get_db() as db:
+        expire_upload_sessions(db)
+
+async def expire_upload_sessions_periodically():
+    while True:
+        try:
+            await run_in_threadpool(expire_upload_sessions_in_new_session)
+        except Exception as e:
+            print(f"Failed to expire upload sessions: {e}")
+        await asyncio.sleep(RESUMABLE_SWEEP_INTERVAL)
+
+async def sweep_expired_links() -> int:
+    """Delete expired links in small batches, found through the expires_at index"""
+    swept = 0
+    while True:
+        async with get_async_db() as db:
+            expired = (await db.scalars(
+                select(Link)
+                .where(Link.expires_at <= datetime.utcnow())
+                .order_by(Link.expires_at)
+                .limit(LINK_SWEEP_BATCH)
+            )).all()
+            if expired:
+                await delete_links(db, expired)
+        swept += len(expired)
+        if len(expired) < LINK_SWEEP_BATCH:
+            return swept
+        # Short transactions with a yield in between, so a large backlog never blocks requests
+        await asyncio.sleep(0)
+
+async def sweep_expired_links_periodically():
+    while True:
+        try:
+            swept = await sweep_expired_links()
+            if swept:
+                print(f"Deleted {swept} expired links")
+        except Exception as e:
+            print(f"Failed to delete expired links: {e}")
+        await asyncio.sleep(LINK_SWEEP_INTERVAL)
+
+def reconcile_storage_in_new_session():
+    with get_db() as db:
+        return reconcile_storage(db)
+
+async def reconcile_storage_periodically():
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL)
+        try:
+            # Throttled and blocking, so it runs on a worker thread
+            report = await run_in_threadpool(reconcile_storage_in_new_session)
+            print(report.summary())
+        except Exception as e:
+            print(f"Failed to reconcile storage: {e}")
+
+async def flush_sessions_periodically():
+    while True:
+        await asyncio.sleep(SESSION_FLUSH_INTERVAL)
+        try:
+            await session_store.flush()
+        except Exception as e:
+            print(f"Failed to flush session activity: {e}")
+
+async def flush_link_stats_periodically():
+    while True:
+        await asyncio.sleep(LINK_STATS_FLUSH_INTERVAL)
+        try:
+            await link_stats.flush()
+        except Exception as e:
+            print(f"Failed to flush link stats: {e}")
+
+_maintenance_lock = None
+
+def acquire_maintenance_lock() -> bool:
+    """Only one worker per upload directory runs the sweepers and the reconciler.
+
+    The lock is released when its worker exits, so a replacement worker takes over.
+    """
+    global _maintenance_lock
+    lock = open(os.path.join(UPLOAD_DIR, ".maintenance.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return False
+    _maintenance_lock = lock
+    return True
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # serve.py prepares the upload directory once for all workers
+    if not os.getenv("SERVE_PREPARED"):
+        ensure_upload_dir()
+    # Buffered writes belong to each worker
+    asyncio.create_task(flush_sessions_periodically())
+    asyncio.create_task(flush_link_stats_periodically())
+    if acquire_maintenance_lock():
+        print(f"Worker {os.getpid()} runs the sweepers and the reconciler")
+        asyncio.create_task(expire_upload_sessions_periodically())
+        asyncio.create_task(sweep_expired_links_periodically())
+        if RECONCILE_INTERVAL:
+            asyncio.create_task(reconcile_storage_periodically())
+
+@app.on_event("shutdown")
+async def flush_on_shutdown():
+    await session_store.flush()
+    await link_stats.flush()
+    await dispose_engines()
+
+@app.on_event("shutdown")
+def stop_preview_workers():
+    preview_builder.shutdown()
 
 @app.get("/file/{custom_link}")
 async def file_page(
@@ -246,11 +769,12 @@ async def file_page(
     credentials: Optional[HTTPBasicCredentials] = Depends(security)
 ):
     """Show file info and download/preview options"""
-    with get_db() as db:
-        link = db.query(Link).filter(Link.custom_link == custom_link).first()
+    async with get_async_db() as db:
+        link = await get_link(db, custom_link)
         
         if not link:
             raise HTTPException(status_code=404, detail="File not found")
+        ensure_available(link)
             
         # Check if user is admin
         is_admin = False
@@ -267,15 +791,140 @@ async def file_page(
             {
                 "request": request,
                 "custom_link": custom_link,
-                "file_path": os.path.basename(link.file_path),
-                "requires_password": bool(link.file_password),
+                "file_path": link.filename,
+                "requires_password": bool(link.file_password) and not verify_access_token(
+                    link, request_access_token(request, custom_link)
+                ),
                 "download_link": f"/download/{custom_link}/file",
                 "preview_link": f"/preview/{custom_link}/file",
                 "is_admin": is_admin
             }
         )
 
+def ensure_available(link: Link):
+    """Expired links and links that used up their downloads are gone, even before the sweeper runs"""
+    if not link.is_available(datetime.utcnow()):
+        raise HTTPException(status_code=410, detail="This link has expired")
+
+async def count_download(request: Request, db: AsyncSession, link: Link, response: Response):
+    """Take one download from the link's quota if the response sends the file from its first byte.
+
+    The response decides with the validator it serves (content, variant or preview ETag), so
+    revalidations, HEAD, seeking and resuming never use up a download. Links without a quota never write.
+    """
+    if link.max_downloads is None or not isinstance(response, ContentFileResponse):
+        return
+    if not await response.sends_from_start(request.scope):
+        return
+    # The limit is checked in the UPDATE itself, so concurrent downloads can never exceed it
+    result = await db.execute(
+        update(Link)
+        .where(Link.id == link.id, Link.download_count < Link.max_downloads)
+        .values(download_count=Link.download_count + 1)
+    )
+    await db.commit()
+    if not result.rowcount:
+        raise HTTPException(status_code=410, detail="This link has reached its download limit")
+
+def request_access_token(request: Request, custom_link: str) -> Optional[str]:
+    """Access token from the ?token= query parameter or the link's cookie"""
+    return request.query_params.get("token") or request.cookies.get(access_cookie_name(custom_link))
+
+def grant_access(response: Response, link: Link):
+    """Remember a successful password check so later requests skip bcrypt"""
+    response.set_cookie(
+        access_cookie_name(link.custom_link),
+        issue_access_token(link),
+        max_age=ACCESS_TOKEN_TTL,
+        httponly=True,
+        samesite="lax"
+    )
+
+async def ensure_content_hash(db: AsyncSession, link: Link):
+    """Files uploaded before content hashes were recorded are hashed once, on first access"""
+    if not link.content_hash and os.path.exists(link.file_path):
+        link.content_hash = await run_in_threadpool(hash_file, link.file_path)
+        await db.commit()
+
+def cache_headers(link: Link) -> dict:
+    # Let browsers and proxies keep a copy but revalidate it (cheap 304s) on every use
+    return {"Cache-Control": "public, no-cache" if link.is_public else "private, no-cache"}
+
+def stats_recorder(link: Link, download: bool = True):
+    """Record the response in the link's statistics once it has been sent; nothing is written per request.
+
+    Previews pass download=False: they add to bytes_sent and last_accessed_at but not to downloads.
+    """
+    link_id = link.id
+    return lambda status_code, bytes_sent: link_stats.record(link_id, status_code, bytes_sent, download)
+
+async def link_file_response(request: Request, db: AsyncSession, link: Link, inline: bool = False, download: bool = True):
+    """Build the response for a link's file with a content-hash ETag and Range support"""
+    await ensure_content_hash(db, link)
+    headers = cache_headers(link)
+
+    # Size and mtime come from the row; rows without them fall back to a stat()
+    path, etag, size = link.file_path, link.content_hash, link.size
+    mtime = link.file_mtime.replace(tzinfo=timezone.utc).timestamp() if link.file_mtime else None
+
+    # Serve a precompressed variant when the client accepts one; Range requests stay on identity
+    variants = link.blob.variants if link.blob else {}
+    if variants:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = None if "range" in request.headers else choose_encoding(
+            request.headers.get("accept-encoding"), variants
+        )
+        if encoding:
+            path = link.file_path + VARIANT_SUFFIXES[encoding]
+            etag = f"{link.content_hash}-{encoding}"
+            size = variants[encoding]
+            headers["Content-Encoding"] = encoding
+
+    if inline:
+        return ContentFileResponse(
+            path,
+            etag,
+            media_type=link.mime_type or "text/plain",
+            content_disposition_type="inline",
+            headers=headers,
+            size=size,
+            mtime=mtime,
+            on_complete=stats_recorder(link, download)
+        )
+    return ContentFileResponse(
+        path,
+        etag,
+        filename=link.filename,
+        media_type='application/octet-stream',
+        headers=headers,
+        size=size,
+        mtime=mtime,
+        on_complete=stats_recorder(link, download)
+    )
+
+async def link_preview_response(request: Request, db: AsyncSession, link: Link, original: bool, size: str):
+    """Serve a cached preview derivative, or the original inline when there is none"""
+    if not original:
+        await ensure_content_hash(db, link)
+        preview = None
+        if link.content_hash:
+            preview = await preview_builder.get(
+                link.file_path, link.content_hash, link.mime_type, link.filename, link.size, size
+            )
+        if preview:
+            return ContentFileResponse(
+                preview.path,
+                os.path.splitext(os.path.basename(preview.path))[0],
+                media_type=preview.media_type,
+                content_disposition_type="inline",
+                headers=cache_headers(link),
+                size=preview.size,
+                on_complete=stats_recorder(link, download=False)
+            )
+    return await link_file_response(request, db, link, inline=True, download=False)
+
 @app.get("/download/{custom_link}")
+@app.head("/download/{custom_link}")
 @app.post("/download/{custom_link}")
 async def serve_file(
     request: Request,
@@ -284,30 +933,31 @@ async def serve_file(
     credentials: Optional[HTTPBasicCredentials] = Depends(security)
 ):
     """Serve the actual file download"""
-    with get_db() as db:
-        link = db.query(Link).filter(Link.custom_link == custom_link).first()
+    async with get_async_db() as db:
+        link = await get_link(db, custom_link)
 
         if not link:
             raise HTTPException(status_code=404, detail="File not found")
+        ensure_available(link)
 
         # If file is public, serve it
         if link.is_public:
-            return FileResponse(
-                link.file_path,
-                filename=os.path.basename(link.file_path),
-                media_type='application/octet-stream'
-            )
+            response = await link_file_response(request, db, link)
+            await count_download(request, db, link, response)
+            return response
 
         # Check admin credentials
         if credentials:
             correct_username = secrets.compare_digest(credentials.username, USERNAME)
             correct_password = secrets.compare_digest(credentials.password, PASSWORD)
             if correct_username and correct_password:
-                return FileResponse(
-                    link.file_path,
-                    filename=os.path.basename(link.file_path),
-                    media_type='application/octet-stream'
-                )
+                return await link_file_response(request, db, link)
+
+        # A token from an earlier password check is verified without running bcrypt again
+        if link.file_password and verify_access_token(link, request_access_token(request, custom_link)):
+            response = await link_file_response(request, db, link)
+            await count_download(request, db, link, response)
+            return response
 
         # For password-protected files, redirect to file info page if no password provided
         if link.file_password and not file_password:
@@ -318,12 +968,11 @@ async def serve_file(
 
         # Verify file password if provided
         if link.file_password and file_password:
-            if link.verify_password(file_password):
-                return FileResponse(
-                    link.file_path,
-                    filename=os.path.basename(link.file_path),
-                    media_type='application/octet-stream'
-                )
+            if await verify_password(link, file_password):
+                response = await link_file_response(request, db, link)
+                await count_download(request, db, link, response)
+                grant_access(response, link)
+                return response
             else:
                 return RedirectResponse(
                     url=f"/file/{custom_link}?error=incorrect_password",
@@ -338,19 +987,84 @@ async def serve_file(
         )
 
 @app.get("/files")
-def list_files(request: Request):
-    with get_db() as db:
-        files = db.query(Link).all()
-        files_info = [{"custom_link": link.custom_link, "filename": os.path.basename(link.file_path)} for link in files]
-        return templates.TemplateResponse("files.html", {"request": request, "files": files_info})
+async def list_files(request: Request, cursor: Optional[str] = None):
+    async with get_async_db() as db:
+        try:
+            page = await list_links(db, sort="name", descending=False, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        files_info = [{"custom_link": link["custom_link"], "filename": link["filename"]} for link in page["links"]]
+        return templates.TemplateResponse(
+            "files.html", {"request": request, "files": files_info, "next_cursor": page["next_cursor"]}
+        )
+
+@app.get("/api/links")
+async def api_list_links(
+    request: Request,
+    sort: str = Query("created_at"),
+    order: str = Query("desc"),
+    visibility: str = Query("all"),
+    cursor: Optional[str] = None,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """One page of links as JSON, keyset-paginated; follow next_cursor for the next page"""
+    if sort not in SORT_KEYS or order not in ("asc", "desc") or visibility not in VISIBILITY_FILTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sort must be one of {', '.join(SORT_KEYS)}, order asc or desc, "
+                   f"visibility one of {', '.join(VISIBILITY_FILTERS)}"
+        )
+
+    async with get_async_db() as db:
+        # The catalog version changes with every write to links (not link_stats), so it validates every page
+        version = await catalog_version(db)
+        headers = {"ETag": f'W/"catalog-{version}"', "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        key = (version, sort, order, visibility, cursor, limit)
+        body = listing_cache.get(key)
+        if body is None:
+            try:
+                page = await list_links(db, sort, order == "desc", visibility, cursor, limit)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            body = json.dumps(page).encode()
+            listing_cache.put(key, body)
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/api/search")
+async def api_search_links(
+    request: Request,
+    q: str = Query(""),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Links whose name starts with q, then links whose name or filename contains it"""
+    async with get_async_db() as db:
+        # Results only change with the catalog, so they are revalidated and cached like listing pages
+        version = await catalog_version(db)
+        headers = {"ETag": f'W/"catalog-{version}"', "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        key = (version, "search", q, limit)
+        body = listing_cache.get(key)
+        if body is None:
+            body = json.dumps({"links": await search_links(db, q, limit)}).encode()
+            listing_cache.put(key, body)
+    return Response(body, media_type="application/json", headers=headers)
 
 @app.post("/delete/{custom_link}")
 async def delete_file(
     custom_link: str,
     credentials: HTTPBasicCredentials = Depends(verify_credentials)
 ):
-    with get_db() as db:
-        link = db.query(Link).filter(Link.custom_link == custom_link).first()
+    async with get_async_db() as db:
+        link = await get_link(db, custom_link)
         
         if not link:
             return RedirectResponse(
@@ -358,19 +1072,14 @@ async def delete_file(
                 status_code=303
             )
             
-        # Delete file from filesystem
+        # Delete the database entry first so a failed commit never leaves a row without its file
         try:
-            if os.path.exists(link.file_path):
-                os.remove(link.file_path)
+            await delete_links(db, [link])
         except Exception as e:
             return RedirectResponse(
                 url=f"/?error=Error deleting file: {str(e)}",
                 status_code=303
             )
-            
-        # Delete database entry
-        db.delete(link)
-        db.commit()
         
         return RedirectResponse(
             url="/?success=File deleted successfully",
@@ -382,8 +1091,8 @@ async def toggle_visibility(
     custom_link: str,
     credentials: HTTPBasicCredentials = Depends(verify_credentials)
 ):
-    with get_db() as db:
-        link = db.query(Link).filter(Link.custom_link == custom_link).first()
+    async with get_async_db() as db:
+        link = await get_link(db, custom_link)
         
         if not link:
             return RedirectResponse(
@@ -392,7 +1101,8 @@ async def toggle_visibility(
             )
         
         link.is_public = not link.is_public
-        db.commit()
+        await db.commit()
+        link_cache.invalidate(custom_link)
         
         status_text = "public" if link.is_public else "private"
         return RedirectResponse(
@@ -400,25 +1110,340 @@ async def toggle_visibility(
             status_code=303
         )
 
+def batch_links(custom_links: List[str]) -> List[str]:
+    """Validate a batch of link names, dropping duplicates but keeping their order"""
+    custom_links = list(dict.fromkeys(link for link in custom_links if link))
+    if not custom_links:
+        raise HTTPException(status_code=400, detail="No links given")
+    if len(custom_links) > BATCH_MAX_LINKS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_LINKS} links per request")
+    return custom_links
+
+async def get_links(db: AsyncSession, custom_links: List[str]) -> List[Link]:
+    return (await db.scalars(select(Link).where(Link.custom_link.in_(custom_links)))).all()
+
+def default_link_name(filename: str) -> str:
+    return "-".join(os.path.splitext(os.path.basename(filename))[0].split())
+
+@app.post("/batch/upload")
+async def batch_upload(
+    files: List[UploadFile] = File(...),
+    custom_links: List[str] = Form(None),
+    is_public: bool = Form(False),
+    file_password: str = Form(None),
+    expires_in: str = Form(None),
+    max_downloads: str = Form(None),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Upload several files at once; links default to the file names without extension"""
+    ttl, max_downloads = link_limits(expires_in, max_downloads)
+    if len(files) > BATCH_MAX_LINKS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_LINKS} files per request")
+    if custom_links and len(custom_links) != len(files):
+        raise HTTPException(status_code=400, detail="Give one custom link per file or none at all")
+    names = custom_links or [default_link_name(file.filename) for file in files]
+
+    # One bcrypt hash shared by the whole batch
+    password_hash = await hash_password(file_password)
+    uploaded, failed = [], []
+    async with get_async_db(write=True) as db:
+        for file, custom_link in zip(files, names):
+            staged = None
+            try:
+                if not custom_link:
+                    raise ValueError("empty link name")
+                staged = await stage_upload(file)
+                link = await publish_upload(
+                    db, custom_link, file.filename, staged, is_public, password_hash, expiry_time(ttl), max_downloads
+                )
+                uploaded.append({
+                    "custom_link": link.custom_link,
+                    "filename": link.filename,
+                    "size": link.size,
+                    "sha256": link.content_hash,
+                    "download_url": f"/download/{link.custom_link}"
+                })
+            except Exception as e:
+                await db.rollback()
+                if staged:
+                    staged.discard()
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                failed.append({"custom_link": custom_link, "filename": file.filename, "error": detail})
+
+    return {"uploaded": uploaded, "failed": failed}
+
+@app.post("/batch/delete")
+async def batch_delete(
+    custom_links: List[str] = Form(...),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Delete many links in one transaction"""
+    custom_links = batch_links(custom_links)
+    async with get_async_db() as db:
+        links = await get_links(db, custom_links)
+        if links:
+            await delete_links(db, links)
+
+    deleted = {link.custom_link for link in links}
+    return {
+        "deleted": [link for link in custom_links if link in deleted],
+        "not_found": [link for link in custom_links if link not in deleted]
+    }
+
+@app.post("/batch/visibility")
+async def batch_visibility(
+    custom_links: List[str] = Form(...),
+    is_public: Optional[bool] = Form(None),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Set (or, without is_public, toggle) the visibility of many links with a single UPDATE"""
+    custom_links = batch_links(custom_links)
+    async with get_async_db() as db:
+        result = await db.execute(
+            update(Link)
+            .where(Link.custom_link.in_(custom_links))
+            .values(is_public=not_(Link.is_public) if is_public is None else is_public)
+            .returning(Link.custom_link, Link.is_public)
+        )
+        changed = {row.custom_link: row.is_public for row in result}
+        await db.commit()
+    link_cache.invalidate(*changed)
+
+    return {
+        "updated": [{"custom_link": link, "is_public": changed[link]} for link in custom_links if link in changed],
+        "not_found": [link for link in custom_links if link not in changed]
+    }
+
+@app.get("/batch/zip")
+async def batch_zip(
+    custom_links: List[str] = Query(...),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Stream a ZIP of the given links, built on the fly without a temporary file"""
+    custom_links = batch_links(custom_links)
+    async with get_async_db() as db:
+        found = {link.custom_link: link for link in await get_links(db, custom_links)}
+
+    missing = [link for link in custom_links if link not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Files not found: {', '.join(missing)}")
+
+    links = [found[link] for link in custom_links]
+    entries = [
+        ArchiveEntry(name, link.file_path, (link.file_mtime or link.created_at).replace(tzinfo=timezone.utc).timestamp())
+        for name, link in zip(unique_names([link.filename for link in links]), links)
+    ]
+    # Once streaming starts the status is sent, so a missing file has to be caught here
+    absent = await run_in_threadpool(missing_entries, entries)
+    if absent:
+        print(f"ZIP request refused, files missing from storage: {', '.join(absent)}")
+        raise HTTPException(status_code=404, detail=f"Files missing from storage: {', '.join(absent)}")
+    # The sync generator runs in the threadpool, one chunk at a time
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="files-{datetime.utcnow():%Y%m%d-%H%M%S}.zip"',
+            "Cache-Control": "no-store"
+        }
+    )
+
+def version_info(link: Link) -> dict:
+    return {
+        "version": link.version,
+        "current": link.version is None,
+        "custom_link": link.custom_link,
+        "filename": link.filename,
+        "size": link.size,
+        "sha256": link.content_hash,
+        "created_at": link.created_at.isoformat(),
+        "expires_at": link.expires_at.isoformat() if link.expires_at else None,
+        "max_downloads": link.max_downloads,
+        "download_count": link.download_count,
+        "download_url": f"/download/{link.custom_link}"
+    }
+
+@app.get("/versions/{custom_link}")
+async def list_versions(
+    custom_link: str,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """List the current upload and archived versions of a link, newest first"""
+    async with get_async_db() as db:
+        links = (await db.scalars(
+            select(Link)
+            .where(Link.base_link == custom_link)
+            .order_by(Link.version.is_(None).desc(), Link.version.desc())
+        )).all()
+
+        if not links:
+            raise HTTPException(status_code=404, detail="File not found")
+
+        return {"custom_link": custom_link, "versions": [version_info(link) for link in links]}
+
+@app.get("/versions/{custom_link}/{version}")
+async def get_version(
+    request: Request,
+    custom_link: str,
+    version: int,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Download one archived version of a link"""
+    async with get_async_db() as db:
+        link = await db.scalar(
+            select(Link).where(Link.base_link == custom_link, Link.version == version)
+        )
+
+        if not link:
+            raise HTTPException(status_code=404, detail="Version not found")
+
+        return await link_file_response(request, db, link)
+
+@app.post("/versions/{custom_link}/prune")
+async def prune_versions(
+    custom_link: str,
+    keep: int = Form(...),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Delete all but the newest `keep` archived versions; the current upload is never touched"""
+    if keep < 0:
+        raise HTTPException(status_code=400, detail="keep must be zero or more")
+
+    async with get_async_db() as db:
+        old_versions = (await db.scalars(
+            select(Link)
+            .where(Link.base_link == custom_link, Link.version.is_not(None))
+            .order_by(Link.version.desc())
+            .offset(keep)
+        )).all()
+        deleted = [link.custom_link for link in old_versions]
+
+        if old_versions:
+            await delete_links(db, old_versions)
+
+        return {"custom_link": custom_link, "deleted": deleted}
+
+@app.get("/stats")
+async def list_stats(
+    limit: int = Query(100, ge=1, le=1000),
+    custom_links: Optional[List[str]] = Query(None),
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Download statistics of the most downloaded links, or of the given links in the order asked,
+    including this worker's unwritten counts"""
+    if custom_links:
+        # The admin table fills in a page's statistics this way, since listings leave them out
+        custom_links = batch_links(custom_links)
+        async with get_async_db() as db:
+            found = {row.custom_link: row for row in (await db.execute(
+                select(Link.id, Link.custom_link, LinkStats)
+                .outerjoin(LinkStats, LinkStats.link_id == Link.id)
+                .where(Link.custom_link.in_(custom_links))
+            )).all()}
+        return {"links": [
+            stats_json(found[link].id, link, found[link].LinkStats) for link in custom_links if link in found
+        ]}
+
+    async with get_async_db() as db:
+        rows = (await db.execute(
+            select(Link.id, Link.custom_link, LinkStats)
+            .join(LinkStats, LinkStats.link_id == Link.id)
+            .order_by(LinkStats.downloads.desc(), Link.id)
+            .limit(limit)
+        )).all()
+        # Pending counts only ever add downloads, so the stored top `limit` plus every link with
+        # pending downloads contains the true top `limit`
+        pending = link_stats.pending_downloads()
+        missing = set(pending) - {row.id for row in rows}
+        if missing:
+            rows += (await db.execute(
+                select(Link.id, Link.custom_link, LinkStats)
+                .outerjoin(LinkStats, LinkStats.link_id == Link.id)
+                .where(Link.id.in_(missing))
+            )).all()
+
+    ranked = sorted(
+        ((row.id, stats_json(row.id, row.custom_link, row.LinkStats)) for row in rows),
+        key=lambda item: (-item[1]["downloads"], item[0])
+    )
+    return {"links": [link for _, link in ranked[:limit]]}
+
+@app.get("/stats/{custom_link}")
+async def get_stats(
+    custom_link: str,
+    credentials: HTTPBasicCredentials = Depends(verify_credentials)
+):
+    """Download statistics of one link"""
+    async with get_async_db() as db:
+        link = await get_link(db, custom_link)
+        if not link:
+            raise HTTPException(status_code=404, detail="File not found")
+        return stats_json(link.id, link.custom_link, await db.get(LinkStats, link.id))
+
+def stats_json(link_id: int, custom_link: str, stats: Optional[LinkStats]) -> dict:
+    usage = stats_info(link_id, stats)
+    return {
+        "custom_link": custom_link,
+        "downloads": usage["downloads"],
+        "bytes_sent": usage["bytes_sent"],
+        "last_accessed_at": usage["last_accessed_at"].isoformat() if usage["last_accessed_at"] else None,
+    }
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the worker is running and answering requests"""
+    return {"status": "ok"}
+
+async def check_database():
+    async with get_async_db() as db:
+        await db.execute(select(1))
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the database answers and the upload directory is writable"""
+    checks = {}
+    try:
+        await asyncio.wait_for(check_database(), READY_TIMEOUT)
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"error: {str(e) or type(e).__name__}"
+    checks["upload_dir"] = "ok" if os.access(UPLOAD_DIR, os.W_OK | os.X_OK) else "error: not writable"
+
+    ready = all(result == "ok" for result in checks.values())
+    return Response(
+        json.dumps({"status": "ready" if ready else "unavailable", "checks": checks}),
+        status_code=200 if ready else 503,
+        media_type="application/json",
+        headers={"Cache-Control": "no-store"}
+    )
+
+@app.get("/metrics")
+def metrics(credentials: Optional[HTTPBasicCredentials] = Depends(security)):
+    """Prometheus text exposition of this worker's metrics"""
+    if not METRICS_PUBLIC:
+        verify_credentials(credentials)
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/logout")
-def logout(request: Request):
+async def logout(request: Request):
     response = RedirectResponse(url="/")
     response.headers["WWW-Authenticate"] = "Basic"
     response.status_code = 401
     
     # Clear session data
     auth = request.headers.get('Authorization')
-    if auth and auth in last_activity:
-        last_activity.pop(auth)
+    if auth:
+        await session_store.remove(session_key(auth))
     
     return response
 
 # Add session status endpoint (optional, for debugging)
 @app.get("/session-status")
-def session_status(request: Request, credentials: HTTPBasicCredentials = Depends(verify_credentials)):
+async def session_status(request: Request, credentials: HTTPBasicCredentials = Depends(verify_credentials)):
     auth = request.headers.get('Authorization')
-    if auth in last_activity:
-        elapsed = time.time() - last_activity[auth]
+    last_seen = await session_store.last_seen(session_key(auth)) if auth else None
+    if last_seen is not None:
+        elapsed = time.time() - last_seen
         remaining = max(0, SESSION_TIMEOUT - elapsed)
         return {
             "session_active": True,
@@ -427,34 +1452,44 @@ def session_status(request: Request, credentials: HTTPBasicCredentials = Depends
     return {"session_active": False}
 
 @app.get("/preview/{custom_link}")
+@app.head("/preview/{custom_link}")
 async def preview_file(
     request: Request,
     custom_link: str,
     file_password: str = Form(None),
+    original: bool = False,
+    size: str = "preview",
     credentials: Optional[HTTPBasicCredentials] = Depends(security)
 ):
-    with get_db() as db:
-        link = db.query(Link).filter(Link.custom_link == custom_link).first()
+    """Preview a file inline; large images and text files get a cached derivative unless ?original=1"""
+    if size not in RENDITIONS:
+        raise HTTPException(status_code=400, detail=f"size must be one of: {', '.join(RENDITIONS)}")
+
+    async with get_async_db() as db:
+        link = await get_link(db, custom_link)
 
         if not link:
             raise HTTPException(status_code=404, detail="File not found")
+        ensure_available(link)
         
         # If file is public, serve it
         if link.is_public:
-            return FileResponse(
-                link.file_path,
-                headers={"Content-Disposition": "inline"}
-            )
+            response = await link_preview_response(request, db, link, original, size)
+            await count_download(request, db, link, response)
+            return response
 
         # Check admin credentials
         if credentials:
             correct_username = secrets.compare_digest(credentials.username, USERNAME)
             correct_password = secrets.compare_digest(credentials.password, PASSWORD)
             if correct_username and correct_password:
-                return FileResponse(
-                    link.file_path,
-                    headers={"Content-Disposition": "inline"}
-                )
+                return await link_preview_response(request, db, link, original, size)
+
+        # A token from an earlier password check is verified without running bcrypt again
+        if link.file_password and verify_access_token(link, request_access_token(request, custom_link)):
+            response = await link_preview_response(request, db, link, original, size)
+            await count_download(request, db, link, response)
+            return response
 
         # For password-protected files, redirect to file info page if no password provided
         if link.file_password and not file_password:
@@ -465,11 +1500,11 @@ async def preview_file(
 
         # Verify file password if provided
         if link.file_password and file_password:
-            if secrets.compare_digest(str(link.file_password), str(file_password)):
-                return FileResponse(
-                    link.file_path,
-                    headers={"Content-Disposition": "inline"}
-                )
+            if await verify_password(link, file_password):
+                response = await link_preview_response(request, db, link, original, size)
+                await count_download(request, db, link, response)
+                grant_access(response, link)
+                return response
             else:
                 return RedirectResponse(
                     url=f"/file/{custom_link}?error=incorrect_password",
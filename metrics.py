@@ -0,0 +1,261 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Metrics configuration
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"  # serve /metrics without admin auth
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BCRYPT_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Updates may come from the event loop and from threadpool threads (sync DB sessions)
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    def _samples(self):
+        return iter(())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, labels: Tuple[str, ...] = ()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, labels: Tuple[str, ...] = ()):
+        self.inc(-amount, labels)
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose value is read from a callback at scrape time, so it costs nothing per request"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def _samples(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return
+        yield f"{self.name} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Fixed buckets: one small list of counts per label set, whatever the number of observations"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket counts (plus +Inf), then sum
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def _samples(self):
+        with self._lock:
+            values = [(labels, list(entry)) for labels, entry in self._values.items()]
+        for labels, entry in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(entry[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+registry = []
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time until the response is fully sent", ("method", "route")
+)
+REQUEST_BYTES = Counter("http_request_bytes_total", "Request body bytes received (uploads)", ("route",))
+RESPONSE_BYTES = Counter("http_response_bytes_total", "Response body bytes sent (downloads)", ("route",))
+ACTIVE_REQUESTS = Gauge("http_requests_active", "Requests currently being handled")
+ACTIVE_STREAMS = Gauge("http_streams_active", "Responses that have started but not finished sending their body")
+DB_QUERIES = Counter("db_queries_total", "Database statements executed")
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Database statement execution time", buckets=DB_QUERY_BUCKETS)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database statements per request", ("route",), buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in database statements per request", ("route",), buckets=DB_QUERY_BUCKETS
+)
+BCRYPT_LATENCY = Histogram(
+    "bcrypt_duration_seconds", "bcrypt hash and verify time, excluding pool wait", ("operation",), buckets=BCRYPT_BUCKETS
+)
+
+# Per-request database totals: [statement count, seconds]. The list is shared, not copied, when the
+# context is copied into threadpool threads, so sync sessions are counted as well.
+_request_db = ContextVar("request_db", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_QUERIES.inc()
+    DB_QUERY_LATENCY.observe(elapsed)
+    totals = _request_db.get()
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += elapsed
+
+
+def observe_bcrypt(operation: str, started: float):
+    BCRYPT_LATENCY.observe(time.perf_counter() - started, (operation,))
+
+
+def route_template(scope: Scope) -> str:
+    """The matched route's path template; unmatched paths share one label to bound cardinality"""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "other")
+    if scope["path"].startswith("/static/"):
+        return "/static"
+    return "other"
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, byte counts and streams; bodies are never copied"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        totals = [0, 0.0]
+        token = _request_db.set(totals)
+        state = {"status": 500, "received": 0, "sent": 0, "streaming": False, "length": 0}
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message):
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                state["status"] = message["status"]
+                state["streaming"] = True
+                ACTIVE_STREAMS.inc()
+                if scope["method"] != "HEAD":
+                    state["length"] = int(Headers(raw=message.get("headers", [])).get("content-length", 0) or 0)
+            elif message_type == "http.response.body":
+                state["sent"] += len(message.get("body", b""))
+            elif message_type == "http.response.zerocopy":
+                state["sent"] += message.get("count") or 0
+            elif message_type == "http.response.pathsend":
+                state["sent"] += state["length"]
+            await send(message)
+            if state["streaming"] and message_type != "http.response.start" and not message.get("more_body", False):
+                state["streaming"] = False
+                ACTIVE_STREAMS.dec()
+
+        ACTIVE_REQUESTS.inc()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            ACTIVE_REQUESTS.dec()
+            if state["streaming"]:
+                ACTIVE_STREAMS.dec()
+            _request_db.reset(token)
+            route = route_template(scope)
+            method = scope["method"]
+            REQUESTS.inc(1, (method, route, str(state["status"])))
+            REQUEST_LATENCY.observe(time.perf_counter() - started, (method, route))
+            if state["received"]:
+                REQUEST_BYTES.inc(state["received"], (route,))
+            if state["sent"]:
+                RESPONSE_BYTES.inc(state["sent"], (route,))
+            REQUEST_DB_QUERIES.observe(totals[0], (route,))
+            REQUEST_DB_TIME.observe(totals[1], (route,))
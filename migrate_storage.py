@@ -0,0 +1,196 @@
+"""Move stored files into the configured blob layout while the app keeps serving them.
+
+Blobs still in another layout (e.g. the flat blobs/ directory) are hard-linked to their new
+path, the links pointing at them are updated in batches, and only then is the old path
+removed. Files from before the blob store (links without a blob) are hashed and adopted into
+the blob store the same way, so identical legacy files end up stored once.
+
+    python migrate_storage.py                # migrate blobs and adopt legacy files
+    python migrate_storage.py --dry-run      # only count what would move
+    python migrate_storage.py --skip-legacy  # leave legacy files where they are
+"""
+import os
+import time
+import argparse
+from typing import List
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from models import Blob, Link
+from database import get_db
+from storage import VARIANT_SUFFIXES, blob_store, hash_file
+from reconcile import Throttle
+
+load_dotenv()
+
+# Storage migration configuration
+STORAGE_MIGRATE_BATCH = int(os.getenv("STORAGE_MIGRATE_BATCH", 200))  # blobs or links per transaction
+STORAGE_MIGRATE_MAX_OPS = int(os.getenv("STORAGE_MIGRATE_MAX_OPS", 200))  # filesystem operations per second
+# Downloads that read the old path just before a batch was committed get this long to open it
+STORAGE_MIGRATE_DRAIN = float(os.getenv("STORAGE_MIGRATE_DRAIN", 5))  # seconds
+
+
+class MigrationReport:
+    def __init__(self):
+        self.moved_blobs = 0
+        self.adopted_files = 0
+        self.deduplicated_files = 0
+        self.updated_links = 0
+        self.missing_files = 0
+
+    def summary(self) -> str:
+        return (
+            f"Moved {self.moved_blobs} blobs and adopted {self.adopted_files} legacy files "
+            f"({self.deduplicated_files} already stored), updated {self.updated_links} links, "
+            f"{self.missing_files} files missing"
+        )
+
+
+def _retire(paths: List[str], throttle: Throttle):
+    """Remove old copies once the rows pointing at them are committed and in-flight reads had time to open them"""
+    if not paths:
+        return
+    time.sleep(STORAGE_MIGRATE_DRAIN)
+    for path in paths:
+        for candidate in [path] + [path + suffix for suffix in VARIANT_SUFFIXES.values()]:
+            throttle.tick()
+            if os.path.exists(candidate):
+                os.remove(candidate)
+
+
+def migrate_blobs(db: Session, report: MigrationReport, throttle: Throttle, dry_run: bool = False):
+    """Relink every blob found outside its path in the current layout"""
+    last = ""
+    while True:
+        shas = db.scalars(
+            select(Blob.sha256).where(Blob.sha256 > last).order_by(Blob.sha256).limit(STORAGE_MIGRATE_BATCH)
+        ).all()
+        if not shas:
+            break
+        last = shas[-1]
+        retired = []
+        for sha256 in shas:
+            throttle.tick()
+            target = blob_store.path(sha256)
+            old_paths = [path for path in blob_store.candidate_paths(sha256)[1:] if os.path.exists(path)]
+            if not old_paths:
+                if not os.path.exists(target):
+                    report.missing_files += 1
+                continue
+            report.moved_blobs += 1
+            if dry_run:
+                continue
+            blob_store.link_into_place(old_paths[0], sha256)
+            result = db.execute(
+                update(Link).where(Link.blob_sha256 == sha256, Link.file_path != target).values(file_path=target)
+            )
+            report.updated_links += result.rowcount
+            retired.extend(old_paths)
+        db.commit()
+
+        # A blob deleted meanwhile must not leave its new copy behind. Renamed aside first and checked
+        # again, so a concurrent upload of the same content gets its files back (see remove_blob)
+        existing = set(db.scalars(select(Blob.sha256).where(Blob.sha256.in_(shas))))
+        gone = {sha256: blob_store.retire(sha256) for sha256 in shas if sha256 not in existing}
+        if gone:
+            db.commit()
+            existing = set(db.scalars(select(Blob.sha256).where(Blob.sha256.in_(list(gone)))))
+            for sha256, files in gone.items():
+                if sha256 in existing:
+                    blob_store.restore(files)
+                else:
+                    blob_store.purge(files)
+        _retire(retired, throttle)
+
+
+def _adopt_file(db: Session, file_path: str, report: MigrationReport) -> bool:
+    """Add one legacy file to the blob store and point its links at it. Returns True if it can be retired"""
+    sha256 = hash_file(file_path)
+    size = os.path.getsize(file_path)
+    if blob_store.locate(sha256):
+        report.deduplicated_files += 1
+    blob_store.link_into_place(file_path, sha256)
+
+    for attempt in range(2):
+        try:
+            links = db.scalars(
+                select(Link.id).where(Link.file_path == file_path, Link.blob_sha256.is_(None))
+            ).all()
+            if not links:
+                # Deleted meanwhile; an unused new copy is collected by the reconciler
+                db.rollback()
+                return False
+            result = db.execute(
+                update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count + len(links))
+            )
+            if not result.rowcount:
+                db.add(Blob(sha256=sha256, size=size, ref_count=len(links)))
+                db.flush()
+            db.execute(
+                update(Link).where(Link.id.in_(links)).values(
+                    blob_sha256=sha256,
+                    content_hash=sha256,
+                    file_path=blob_store.path(sha256),
+                    size=func.coalesce(Link.size, size)
+                )
+            )
+            db.commit()
+            report.updated_links += len(links)
+            return True
+        except IntegrityError:
+            # An upload of the same content created the blob row first
+            db.rollback()
+            if attempt:
+                raise
+    return False
+
+
+def adopt_legacy_files(db: Session, report: MigrationReport, throttle: Throttle, dry_run: bool = False):
+    """Move files from before the blob store (directly in UPLOAD_DIR) into it"""
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Link.id, Link.file_path)
+            .where(Link.id > last_id, Link.blob_sha256.is_(None))
+            .order_by(Link.id)
+            .limit(STORAGE_MIGRATE_BATCH)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        retired = []
+        # Several links may share one legacy file
+        for file_path in dict.fromkeys(row.file_path for row in rows):
+            throttle.tick()
+            if not os.path.exists(file_path):
+                report.missing_files += 1
+                continue
+            report.adopted_files += 1
+            if not dry_run and _adopt_file(db, file_path, report):
+                retired.append(file_path)
+        _retire(retired, throttle)
+
+
+def migrate_storage(db: Session, adopt_legacy: bool = True, dry_run: bool = False) -> MigrationReport:
+    report = MigrationReport()
+    throttle = Throttle(STORAGE_MIGRATE_MAX_OPS)
+    migrate_blobs(db, report, throttle, dry_run)
+    if adopt_legacy:
+        adopt_legacy_files(db, report, throttle, dry_run)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="count what would move without changing anything")
+    parser.add_argument("--skip-legacy", action="store_true", help="do not adopt files from before the blob store")
+    args = parser.parse_args()
+
+    with get_db() as db:
+        report = migrate_storage(db, adopt_legacy=not args.skip_legacy, dry_run=args.dry_run)
+    print(("Dry run: " if args.dry_run else "") + report.summary())
+
+
+if __name__ == "__main__":
+    main()
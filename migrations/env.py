@@ -73,7 +73,8 @@ def get_url():
 def include_object(object, name, type_, reflected, compare_to):
     """Filter out unsupported SQLite operations"""
     if type_ == "table":
-        return True
+        # The SQLite search index (links_fts and its shadow tables) is managed by hand
+        return not (reflected and name.startswith("links_fts"))
         
     # For SQLite, skip ALTER TABLE operations that modify columns
     if context.get_context().dialect.name == "sqlite":
@@ -0,0 +1,67 @@
+"""Add explicit link versions and per-link version counters
+
+Revision ID: 0a6d3f8e92b4
+Revises: f4c93a1b7e05
+Create Date: 2026-10-18 15:22:49.017736
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6d3f8e92b4'
+down_revision: Union[str, None] = 'f4c93a1b7e05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('link_version_counters',
+    sa.Column('base_link', sa.String(length=255), nullable=False),
+    sa.Column('last_version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('base_link')
+    )
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('base_link', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_links_base_link'), ['base_link'], unique=False)
+
+    # Recognise "{name}-vN" rows created by the old renaming logic as versions of {name}
+    # when {name} still exists; everything else is its own current version
+    conn = op.get_bind()
+    links = sa.table(
+        'links',
+        sa.column('id', sa.Integer),
+        sa.column('custom_link', sa.String),
+        sa.column('base_link', sa.String),
+        sa.column('version', sa.Integer),
+    )
+    counters = sa.table('link_version_counters', sa.column('base_link', sa.String), sa.column('last_version', sa.Integer))
+    rows = conn.execute(sa.select(links.c.id, links.c.custom_link)).fetchall()
+    names = {row.custom_link for row in rows}
+    last_versions = {}
+    for row in rows:
+        match = re.match(r'^(.*)-v(\d+)$', row.custom_link)
+        if match and match.group(1) in names:
+            base_link, version = match.group(1), int(match.group(2))
+            last_versions[base_link] = max(last_versions.get(base_link, 0), version)
+        else:
+            base_link, version = row.custom_link, None
+        conn.execute(links.update().where(links.c.id == row.id).values(base_link=base_link, version=version))
+    if last_versions:
+        conn.execute(counters.insert(), [
+            {"base_link": base_link, "last_version": version} for base_link, version in last_versions.items()
+        ])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_links_base_link'))
+        batch_op.drop_column('version')
+        batch_op.drop_column('base_link')
+
+    op.drop_table('link_version_counters')
@@ -0,0 +1,28 @@
+"""Add precompressed variant list to blobs
+
+Revision ID: 1c7f2b9a4e83
+Revises: 0a6d3f8e92b4
+Create Date: 2026-10-18 16:47:05.228613
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c7f2b9a4e83'
+down_revision: Union[str, None] = '0a6d3f8e92b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('blobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('encodings', sa.String(length=128), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('blobs', schema=None) as batch_op:
+        batch_op.drop_column('encodings')
@@ -0,0 +1,70 @@
+"""Add listing index and catalog version
+
+Revision ID: 3a8f1d6c4b27
+Revises: 9d4b6e2a7c58
+Create Date: 2026-10-18 19:47:12.580391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a8f1d6c4b27'
+down_revision: Union[str, None] = '9d4b6e2a7c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Every write to these tables bumps the catalog version, whichever process makes it.
+# On SQLite, a later batch migration that recreates one of these tables must recreate its triggers.
+TRACKED_TABLES = ('links', 'link_stats')
+
+
+def upgrade() -> None:
+    op.create_index('ix_links_size_sort', 'links', [sa.text('coalesce(size, -1)'), 'id'], unique=False)
+
+    op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, 0)")
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            CREATE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+            BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        for table in TRACKED_TABLES:
+            # Once per statement, so a batched write bumps the version once
+            op.execute(
+                f"CREATE TRIGGER {table}_catalog_version AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH STATEMENT EXECUTE PROCEDURE bump_catalog_version()"
+            )
+    else:
+        for table in TRACKED_TABLES:
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                op.execute(
+                    f"CREATE TRIGGER {table}_catalog_version_{event.lower()} AFTER {event} ON {table} "
+                    f"BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END"
+                )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TRACKED_TABLES:
+            op.execute(f"DROP TRIGGER {table}_catalog_version ON {table}")
+        op.execute("DROP FUNCTION bump_catalog_version()")
+    else:
+        for table in TRACKED_TABLES:
+            for event in ('insert', 'update', 'delete'):
+                op.execute(f"DROP TRIGGER {table}_catalog_version_{event}")
+
+    op.drop_table('catalog_version')
+    op.drop_index('ix_links_size_sort', table_name='links')
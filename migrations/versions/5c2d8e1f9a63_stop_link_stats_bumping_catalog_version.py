@@ -0,0 +1,43 @@
+"""Stop link stats bumping catalog version
+
+Revision ID: 5c2d8e1f9a63
+Revises: c71e5a9f2d84
+Create Date: 2026-10-18 23:12:09.417305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2d8e1f9a63'
+down_revision: Union[str, None] = 'c71e5a9f2d84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Statistics flushes from every worker took the catalog_version row lock and invalidated every
+# listing page; listings no longer carry statistics, so only writes to links bump the version.
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER link_stats_catalog_version ON link_stats")
+    else:
+        for event in ('insert', 'update', 'delete'):
+            op.execute(f"DROP TRIGGER link_stats_catalog_version_{event}")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE TRIGGER link_stats_catalog_version AFTER INSERT OR UPDATE OR DELETE ON link_stats "
+            "FOR EACH STATEMENT EXECUTE PROCEDURE bump_catalog_version()"
+        )
+    else:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            op.execute(
+                f"CREATE TRIGGER link_stats_catalog_version_{event.lower()} AFTER {event} ON link_stats "
+                f"BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END"
+            )
@@ -0,0 +1,42 @@
+"""Add link expiry and download quotas
+
+Revision ID: 5e9b2c7d1a36
+Revises: 1c7f2b9a4e83
+Create Date: 2026-10-18 18:21:44.903517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9b2c7d1a36'
+down_revision: Union[str, None] = '1c7f2b9a4e83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('max_downloads', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('download_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_links_expires_at'), ['expires_at'], unique=False)
+
+    with op.batch_alter_table('upload_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('link_ttl', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('max_downloads', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('upload_sessions', schema=None) as batch_op:
+        batch_op.drop_column('max_downloads')
+        batch_op.drop_column('link_ttl')
+
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_links_expires_at'))
+        batch_op.drop_column('download_count')
+        batch_op.drop_column('max_downloads')
+        batch_op.drop_column('expires_at')
@@ -0,0 +1,36 @@
+"""Add case-insensitive link prefix index
+
+Revision ID: 8e4b2f7a1c95
+Revises: 5c2d8e1f9a63
+Create Date: 2026-10-18 23:41:27.583014
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4b2f7a1c95'
+down_revision: Union[str, None] = '5c2d8e1f9a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Trigram indexes cannot answer one- or two-character prefixes, so both dialects get a btree
+    if op.get_bind().dialect.name == 'postgresql':
+        # text_pattern_ops lets LIKE 'prefix%' use the index whatever the database collation
+        op.create_index(
+            'ix_links_custom_link_lower', 'links', [sa.text('lower(custom_link) text_pattern_ops')], unique=False
+        )
+        return
+    # SQLite walks this as a range, already in name order
+    op.create_index(
+        'ix_links_custom_link_lower', 'links', [sa.text('lower(custom_link)'), 'custom_link'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_links_custom_link_lower', table_name='links')
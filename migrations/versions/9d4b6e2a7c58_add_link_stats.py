@@ -0,0 +1,32 @@
+"""Add link download statistics
+
+Revision ID: 9d4b6e2a7c58
+Revises: 5e9b2c7d1a36
+Create Date: 2026-10-18 19:02:57.146203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4b6e2a7c58'
+down_revision: Union[str, None] = '5e9b2c7d1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('link_stats',
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.Column('downloads', sa.BigInteger(), nullable=False),
+    sa.Column('bytes_sent', sa.BigInteger(), nullable=False),
+    sa.Column('last_accessed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('link_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('link_stats')
@@ -0,0 +1,29 @@
+"""Add content hash to links
+
+Revision ID: b3f08c6e1d47
+Revises: 7c1e5a9d2f31
+Create Date: 2026-10-18 10:03:51.207344
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f08c6e1d47'
+down_revision: Union[str, None] = '7c1e5a9d2f31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows are hashed lazily the first time they are served
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
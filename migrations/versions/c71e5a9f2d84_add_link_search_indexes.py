@@ -0,0 +1,65 @@
+"""Add link search indexes
+
+Revision ID: c71e5a9f2d84
+Revises: 3a8f1d6c4b27
+Create Date: 2026-10-18 21:05:38.214760
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71e5a9f2d84'
+down_revision: Union[str, None] = '3a8f1d6c4b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ('custom_link', 'filename')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in SEARCH_COLUMNS:
+            op.create_index(
+                f'ix_links_{column}_trgm', 'links', [column], unique=False,
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+            )
+        return
+
+    # External-content FTS5 table over links (the trigram tokenizer needs SQLite 3.34+), kept in sync
+    # by triggers. On SQLite, a later batch migration that recreates links must recreate these triggers.
+    op.execute(
+        "CREATE VIRTUAL TABLE links_fts USING fts5("
+        "custom_link, filename, content='links', content_rowid='id', tokenize='trigram')"
+    )
+    op.execute(
+        "CREATE TRIGGER links_fts_insert AFTER INSERT ON links BEGIN "
+        "INSERT INTO links_fts(rowid, custom_link, filename) VALUES (new.id, new.custom_link, new.filename); END"
+    )
+    op.execute(
+        "CREATE TRIGGER links_fts_delete AFTER DELETE ON links BEGIN "
+        "INSERT INTO links_fts(links_fts, rowid, custom_link, filename) "
+        "VALUES ('delete', old.id, old.custom_link, old.filename); END"
+    )
+    op.execute(
+        "CREATE TRIGGER links_fts_update AFTER UPDATE OF custom_link, filename ON links BEGIN "
+        "INSERT INTO links_fts(links_fts, rowid, custom_link, filename) "
+        "VALUES ('delete', old.id, old.custom_link, old.filename); "
+        "INSERT INTO links_fts(rowid, custom_link, filename) VALUES (new.id, new.custom_link, new.filename); END"
+    )
+    op.execute("INSERT INTO links_fts(links_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in SEARCH_COLUMNS:
+            op.drop_index(f'ix_links_{column}_trgm', table_name='links')
+        return
+
+    for event in ('insert', 'delete', 'update'):
+        op.execute(f"DROP TRIGGER links_fts_{event}")
+    op.execute("DROP TABLE links_fts")
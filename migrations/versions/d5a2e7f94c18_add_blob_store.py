@@ -0,0 +1,56 @@
+"""Add content-addressed blob store
+
+Revision ID: d5a2e7f94c18
+Revises: b3f08c6e1d47
+Create Date: 2026-10-18 11:26:40.934117
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a2e7f94c18'
+down_revision: Union[str, None] = 'b3f08c6e1d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('filename', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('blob_sha256', sa.String(length=64), nullable=True))
+
+    # Existing files keep their flat path; their download name is the file's basename
+    conn = op.get_bind()
+    links = sa.table('links', sa.column('id', sa.Integer), sa.column('file_path', sa.Text), sa.column('filename', sa.Text))
+    for row in conn.execute(sa.select(links.c.id, links.c.file_path)).fetchall():
+        conn.execute(
+            links.update().where(links.c.id == row.id).values(filename=os.path.basename(row.file_path))
+        )
+
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.alter_column('filename', existing_type=sa.Text(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_links_blob_sha256'), ['blob_sha256'], unique=False)
+        batch_op.create_foreign_key('fk_links_blob_sha256_blobs', 'blobs', ['blob_sha256'], ['sha256'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_links_blob_sha256_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_links_blob_sha256'))
+        batch_op.drop_column('blob_sha256')
+        batch_op.drop_column('filename')
+
+    op.drop_table('blobs')
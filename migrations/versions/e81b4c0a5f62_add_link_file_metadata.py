@@ -0,0 +1,57 @@
+"""Add file metadata columns to links
+
+Revision ID: e81b4c0a5f62
+Revises: d5a2e7f94c18
+Create Date: 2026-10-18 12:41:17.662903
+
+"""
+import os
+import mimetypes
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81b4c0a5f62'
+down_revision: Union[str, None] = 'd5a2e7f94c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('size', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('mime_type', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('file_mtime', sa.DateTime(), nullable=True))
+
+    # Backfill from the filesystem once; missing files keep NULL metadata.
+    # Content hashes of older rows are still computed lazily on first download.
+    conn = op.get_bind()
+    links = sa.table(
+        'links',
+        sa.column('id', sa.Integer),
+        sa.column('file_path', sa.Text),
+        sa.column('filename', sa.Text),
+        sa.column('size', sa.BigInteger),
+        sa.column('mime_type', sa.String),
+        sa.column('file_mtime', sa.DateTime),
+    )
+    for row in conn.execute(sa.select(links.c.id, links.c.file_path, links.c.filename)).fetchall():
+        values = {"mime_type": mimetypes.guess_type(row.filename)[0] or "application/octet-stream"}
+        try:
+            stat_result = os.stat(row.file_path)
+            values["size"] = stat_result.st_size
+            values["file_mtime"] = datetime.utcfromtimestamp(stat_result.st_mtime)
+        except OSError:
+            pass
+        conn.execute(links.update().where(links.c.id == row.id).values(**values))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_column('file_mtime')
+        batch_op.drop_column('mime_type')
+        batch_op.drop_column('size')
@@ -0,0 +1,35 @@
+"""Add shared admin session store
+
+Revision ID: f4c93a1b7e05
+Revises: e81b4c0a5f62
+Create Date: 2026-10-18 14:08:22.381590
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c93a1b7e05'
+down_revision: Union[str, None] = 'e81b4c0a5f62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('admin_sessions',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('last_seen', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('admin_sessions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_admin_sessions_last_seen'), ['last_seen'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('admin_sessions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_admin_sessions_last_seen'))
+
+    op.drop_table('admin_sessions')
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Text, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
 from passlib.context import CryptContext
+from datetime import datetime
 
 Base = declarative_base()
 
@@ -13,15 +15,36 @@ class Link(Base):
 
     id = Column(Integer, primary_key=True, nullable=False)
     custom_link = Column(String(255), unique=True, nullable=False, index=True)
+    # Every upload under a link name shares its base_link; archived versions get a number
+    # and are renamed to "{base_link}-v{version}", the current upload has version NULL
+    base_link = Column(String(255), nullable=True, index=True)
+    version = Column(Integer, nullable=True)
     file_path = Column(Text, nullable=False)
+    filename = Column(Text, nullable=False)  # original upload name, used for downloads
+    blob_sha256 = Column(String(64), ForeignKey('blobs.sha256'), nullable=True, index=True)
+    blob = relationship("Blob", lazy="joined")  # loaded with the link, no extra query
     is_public = Column(Boolean, default=False, nullable=False)
     file_password = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True)  # SHA-256 hex digest, used as the ETag
+    # File metadata captured at upload so listings and downloads never stat() the file
+    size = Column(BigInteger, nullable=True)
+    mime_type = Column(String(255), nullable=True)
+    file_mtime = Column(DateTime, nullable=True)
+    # Optional limits set at upload; expired links are deleted by the sweeper
+    expires_at = Column(DateTime, nullable=True, index=True)
+    max_downloads = Column(Integer, nullable=True)
+    download_count = Column(Integer, default=0, server_default='0', nullable=False)
     created_at = Column(
         DateTime, 
         server_default=func.now(),
         nullable=False
     )
 
+    # Keyset pagination of the listing API; the id makes each sort key unique
+    __table_args__ = (
+        Index('ix_links_size_sort', func.coalesce(size, -1), 'id'),
+    )
+
     @staticmethod
     def hash_password(password: str) -> str:
         """Hash a password for storing."""
@@ -33,9 +56,123 @@ class Link(Base):
             return False
         return pwd_context.verify(plain_password, self.file_password)
 
+    def is_available(self, now: datetime) -> bool:
+        """False once the link has expired or used up its downloads"""
+        if self.expires_at is not None and self.expires_at <= now:
+            return False
+        return self.max_downloads is None or self.download_count < self.max_downloads
+
     def __repr__(self):
         return f"<Link(custom_link='{self.custom_link}', is_public={self.is_public})>"
 
+class LinkVersionCounter(Base):
+    """Last archive version number handed out per base link, incremented atomically on re-upload"""
+    __tablename__ = 'link_version_counters'
+
+    base_link = Column(String(255), primary_key=True, nullable=False)
+    last_version = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<LinkVersionCounter(base_link='{self.base_link}', last_version={self.last_version})>"
+
+class Blob(Base):
+    """Content-addressed file stored once under UPLOAD_DIR/blobs and shared by every link to it"""
+    __tablename__ = 'blobs'
+
+    sha256 = Column(String(64), primary_key=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, default=0, nullable=False)
+    # Precompressed variants stored next to the blob, e.g. "gzip=1234,br=987"
+    encodings = Column(String(128), nullable=True)
+    created_at = Column(
+        DateTime,
+        server_default=func.now(),
+        nullable=False
+    )
+
+    @property
+    def variants(self) -> dict:
+        """Compressed variant sizes keyed by content coding"""
+        return Blob.parse_variants(self.encodings)
+
+    @staticmethod
+    def parse_variants(encodings: str) -> dict:
+        if not encodings:
+            return {}
+        return {name: int(size) for name, size in (item.split("=") for item in encodings.split(","))}
+
+    @staticmethod
+    def format_variants(variants: dict) -> str:
+        return ",".join(f"{name}={size}" for name, size in variants.items()) or None
+
+    def __repr__(self):
+        return f"<Blob(sha256='{self.sha256}', ref_count={self.ref_count})>"
+
+class UploadSession(Base):
+    """A resumable upload in progress; chunks are stored under UPLOAD_DIR/.sessions/<id>"""
+    __tablename__ = 'upload_sessions'
+
+    id = Column(String(64), primary_key=True, nullable=False)
+    custom_link = Column(String(255), nullable=False)
+    filename = Column(Text, nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    is_public = Column(Boolean, default=False, nullable=False)
+    file_password = Column(String, nullable=True)
+    # Limits for the published link; the TTL counts from completion, not from session start
+    link_ttl = Column(Integer, nullable=True)
+    max_downloads = Column(Integer, nullable=True)
+    created_at = Column(
+        DateTime,
+        server_default=func.now(),
+        nullable=False
+    )
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    @property
+    def chunk_count(self) -> int:
+        return -(-self.total_size // self.chunk_size)
+
+    def __repr__(self):
+        return f"<UploadSession(id='{self.id}', custom_link='{self.custom_link}')>"
+
+class AdminSession(Base):
+    """Last activity per admin session, shared by all workers when SESSION_STORE=database"""
+    __tablename__ = 'admin_sessions'
+
+    key = Column(String(64), primary_key=True, nullable=False)  # SHA-256 of the Authorization header
+    last_seen = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<AdminSession(key='{self.key[:8]}...', last_seen={self.last_seen})>"
+
+class CatalogVersion(Base):
+    """Single row counting changes to links, bumped by database triggers; used as the listing ETag.
+
+    Statistics live outside the listing, so writes to link_stats deliberately leave it alone.
+    """
+    __tablename__ = 'catalog_version'
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    version = Column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<CatalogVersion(version={self.version})>"
+
+class LinkStats(Base):
+    """Download statistics per link, written in batches by the link stats buffer rather than per request"""
+    __tablename__ = 'link_stats'
+
+    # No foreign key: a batch must not fail because one of its links was deleted meanwhile. The upsert
+    # joins links instead, so statistics are never written for a link that no longer exists
+    link_id = Column(Integer, primary_key=True, nullable=False)
+    downloads = Column(BigInteger, default=0, nullable=False)
+    bytes_sent = Column(BigInteger, default=0, nullable=False)
+    last_accessed_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<LinkStats(link_id={self.link_id}, downloads={self.downloads})>"
+
 # Optional: Add migrations table model if you want to track it with SQLAlchemy
 class Migration(Base):
     __tablename__ = 'alembic_version'
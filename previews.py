@@ -0,0 +1,237 @@
+import os
+import asyncio
+import secrets
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple, Optional
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from storage import UPLOAD_DIR
+
+load_dotenv()
+
+# Optional image support; without Pillow only text excerpts are generated
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Preview configuration
+PREVIEW_ENABLED = os.getenv("PREVIEW_ENABLED", "true").lower() == "true"
+PREVIEW_DIR = os.path.join(UPLOAD_DIR, ".previews")
+PREVIEW_CACHE_SIZE = int(os.getenv("PREVIEW_CACHE_SIZE", 512 * 1024 * 1024))  # bytes kept on disk
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", 2))
+PREVIEW_MAX_DIMENSION = int(os.getenv("PREVIEW_MAX_DIMENSION", 1600))  # pixels, longest side
+PREVIEW_THUMB_DIMENSION = int(os.getenv("PREVIEW_THUMB_DIMENSION", 320))
+PREVIEW_TEXT_BYTES = int(os.getenv("PREVIEW_TEXT_BYTES", 64 * 1024))  # size of text excerpts
+# Images smaller than this are served as they are
+PREVIEW_MIN_IMAGE_SIZE = 256 * 1024
+
+PREVIEW_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+PREVIEW_TEXT_TYPES = {"application/json", "application/xml", "application/x-ndjson", "application/x-yaml", "application/yaml"}
+PREVIEW_TEXT_EXTENSIONS = {".log", ".csv", ".tsv", ".json", ".ndjson", ".jsonl", ".txt", ".xml", ".yaml", ".yml", ".md", ".sql"}
+
+# Renditions by name: longest side in pixels for images
+RENDITIONS = {"preview": PREVIEW_MAX_DIMENSION, "thumb": PREVIEW_THUMB_DIMENSION}
+
+PREVIEW_MEDIA_TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".txt": "text/plain; charset=utf-8"}
+
+
+class Preview(NamedTuple):
+    path: str
+    media_type: str
+    size: int
+
+
+def preview_kind(mime_type: Optional[str], filename: str, size: Optional[int]) -> Optional[str]:
+    """'image', 'text' or None when the original is served as it is"""
+    if mime_type in PREVIEW_IMAGE_TYPES:
+        if Image is None or (size is not None and size < PREVIEW_MIN_IMAGE_SIZE):
+            return None
+        return "image"
+    is_text = (mime_type or "").startswith("text/") or mime_type in PREVIEW_TEXT_TYPES \
+        or os.path.splitext(filename)[1].lower() in PREVIEW_TEXT_EXTENSIONS
+    if is_text and (size is None or size > PREVIEW_TEXT_BYTES):
+        return "text"
+    return None
+
+
+def _preview_base(content_hash: str, rendition: str) -> str:
+    return os.path.join(PREVIEW_DIR, f"{content_hash}-{rendition}")
+
+
+def _find_cached(content_hash: str, rendition: str) -> Optional[Preview]:
+    base = _preview_base(content_hash, rendition)
+    for extension, media_type in PREVIEW_MEDIA_TYPES.items():
+        try:
+            size = os.path.getsize(base + extension)
+        except OSError:
+            continue
+        # The mtime doubles as the last-used time for eviction
+        os.utime(base + extension)
+        return Preview(base + extension, media_type, size)
+    return None
+
+
+def _build_image(source_path: str, base: str, max_dimension: int) -> Optional[str]:
+    with Image.open(source_path) as image:
+        # Let JPEG decode at a reduced scale instead of decoding every pixel first
+        image.draft("RGB", (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension))
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        if has_alpha:
+            extension, image = ".png", image.convert("RGBA")
+            save_options = {"format": "PNG", "optimize": True}
+        else:
+            extension, image = ".jpg", image.convert("RGB")
+            save_options = {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True}
+        temp_path = f"{base}.{secrets.token_hex(4)}.tmp"
+        try:
+            image.save(temp_path, **save_options)
+            os.replace(temp_path, base + extension)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return base + extension
+
+
+def _build_text(source_path: str, base: str) -> str:
+    with open(source_path, "rb") as source:
+        excerpt = source.read(PREVIEW_TEXT_BYTES)
+        total = os.fstat(source.fileno()).st_size
+    # Cut at a line boundary so the excerpt does not end mid-line or mid-character
+    if len(excerpt) == PREVIEW_TEXT_BYTES and b"\n" in excerpt:
+        excerpt = excerpt[:excerpt.rindex(b"\n") + 1]
+    text = excerpt.decode("utf-8", errors="replace")
+    if total > len(excerpt):
+        text += f"\n... preview truncated, showing {len(excerpt)} of {total} bytes\n"
+    temp_path = f"{base}.{secrets.token_hex(4)}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as target:
+        target.write(text)
+    os.replace(temp_path, base + ".txt")
+    return base + ".txt"
+
+
+def build_preview(source_path: str, content_hash: str, kind: str, rendition: str) -> Optional[str]:
+    """Runs in a worker process: write one derivative and return its path"""
+    os.makedirs(PREVIEW_DIR, exist_ok=True)
+    base = _preview_base(content_hash, rendition)
+    if kind == "image":
+        return _build_image(source_path, base, RENDITIONS[rendition])
+    return _build_text(source_path, base)
+
+
+def evict_previews(limit: int = PREVIEW_CACHE_SIZE):
+    """Remove the least recently used derivatives until the cache fits in its size limit"""
+    try:
+        entries = [entry for entry in os.scandir(PREVIEW_DIR) if entry.is_file()]
+    except FileNotFoundError:
+        return
+    files = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def remove_previews(content_hash: str):
+    """Drop every cached derivative of a file that no longer exists"""
+    for rendition in RENDITIONS:
+        base = _preview_base(content_hash, rendition)
+        for extension in PREVIEW_MEDIA_TYPES:
+            if os.path.exists(base + extension):
+                os.remove(base + extension)
+
+
+class PreviewBuilder:
+    """Builds derivatives in a process pool so decoding and resizing never block a web worker"""
+
+    def __init__(self, workers: int = PREVIEW_WORKERS):
+        self.workers = workers
+        self._pool = None
+        # Builds in flight, so concurrent requests for one file wait on a single job
+        self._pending = {}
+        # Files whose derivative could not be built are served as originals from then on
+        self._failed = set()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Created on first use and with 'spawn', so workers never inherit the server's threads or sockets
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _submit(self, source_path: str, content_hash: str, kind: str, rendition: str):
+        key = (content_hash, rendition)
+        future = self._pending.get(key)
+        if future is None:
+            future = self._get_pool().submit(build_preview, source_path, content_hash, kind, rendition)
+            self._pending[key] = future
+            future.add_done_callback(lambda f: self._finished(key, f))
+        return future
+
+    def _finished(self, key, future):
+        self._pending.pop(key, None)
+        if future.cancelled():
+            return
+        if isinstance(future.exception(), BrokenProcessPool):
+            # A worker died (e.g. killed for memory); start a fresh pool on the next request
+            print(f"Preview worker pool broke while building {key[0]}")
+            self._pool = None
+        elif future.exception() is not None:
+            print(f"Failed to build preview for {key[0]}: {future.exception()}")
+            if len(self._failed) >= 10000:
+                self._failed.clear()
+            self._failed.add(key)
+        else:
+            evict_previews()
+
+    def warm(self, source_path: str, content_hash: str, mime_type: Optional[str], filename: str, size: int):
+        """Start building the default derivative for a new upload in the background"""
+        kind = preview_kind(mime_type, filename, size)
+        if PREVIEW_ENABLED and kind:
+            self._submit(source_path, content_hash, kind, "preview")
+
+    async def get(
+        self,
+        source_path: str,
+        content_hash: str,
+        mime_type: Optional[str],
+        filename: str,
+        size: Optional[int],
+        rendition: str = "preview"
+    ) -> Optional[Preview]:
+        """Return the cached derivative, building it first if needed; None means serve the original"""
+        kind = preview_kind(mime_type, filename, size)
+        if kind == "text":
+            # Text excerpts have a single rendition
+            rendition = "preview"
+        if not PREVIEW_ENABLED or not kind or (content_hash, rendition) in self._failed:
+            return None
+
+        cached = await run_in_threadpool(_find_cached, content_hash, rendition)
+        if cached:
+            return cached
+
+        try:
+            await asyncio.wrap_future(self._submit(source_path, content_hash, kind, rendition))
+        except Exception:
+            return None
+        return await run_in_threadpool(_find_cached, content_hash, rendition)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+preview_builder = PreviewBuilder()
@@ -0,0 +1,300 @@
+"""Reconcile UPLOAD_DIR with the database.
+
+Finds orphaned files (on disk, unknown to the database) and dangling rows (in the database,
+missing on disk), then reports, quarantines or deletes them. Runs periodically inside the
+app and as a CLI:
+
+    python reconcile.py                      # report only
+    python reconcile.py --action quarantine  # move orphans to UPLOAD_DIR/.quarantine
+    python reconcile.py --action delete      # delete orphans and dangling rows
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from datetime import datetime
+from typing import Iterator, List
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from models import Blob, Link, LinkStats
+from database import get_db
+from link_cache import link_cache
+from link_stats import link_stats
+from storage import UPLOAD_DIR, BLOB_DIR, VARIANT_SUFFIXES, blob_store
+
+load_dotenv()
+
+# Reconciler configuration
+RECONCILE_INTERVAL = int(os.getenv("RECONCILE_INTERVAL", 6 * 60 * 60))  # seconds between runs, 0 disables
+RECONCILE_ACTION = os.getenv("RECONCILE_ACTION", "quarantine")  # 'report', 'quarantine' or 'delete'
+RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", 500))  # paths or rows per query
+RECONCILE_MAX_OPS = int(os.getenv("RECONCILE_MAX_OPS", 200))  # filesystem operations per second
+RECONCILE_GRACE = int(os.getenv("RECONCILE_GRACE", 60 * 60))  # ignore files younger than this (in-flight uploads)
+RECONCILE_QUARANTINE_TTL = int(os.getenv("RECONCILE_QUARANTINE_TTL", 7 * 24 * 60 * 60))
+
+QUARANTINE_DIR = os.path.join(UPLOAD_DIR, ".quarantine")
+# Only this many paths per category are kept in a report; counts are always exact
+REPORT_SAMPLE_SIZE = 100
+
+_SUFFIX_ENCODINGS = {suffix: encoding for encoding, suffix in VARIANT_SUFFIXES.items()}
+
+
+class Throttle:
+    """Caps filesystem operations per second so the reconciler never competes with requests for I/O"""
+
+    def __init__(self, rate: int):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next_slot = time.monotonic()
+
+    def tick(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_slot > now:
+            time.sleep(self.next_slot - now)
+        self.next_slot = max(self.next_slot, now) + self.interval
+
+
+class ReconcileReport:
+    def __init__(self, action: str):
+        self.action = action
+        self.started_at = datetime.utcnow()
+        self.scanned_files = 0
+        self.scanned_rows = 0
+        self.reclaimed_bytes = 0
+        self.counts = {"orphan_files": 0, "dangling_links": 0, "dangling_blobs": 0, "purged_quarantine": 0}
+        self.samples = {key: [] for key in self.counts}
+
+    def add(self, category: str, item: str):
+        self.counts[category] += 1
+        if len(self.samples[category]) < REPORT_SAMPLE_SIZE:
+            self.samples[category].append(item)
+
+    def as_dict(self) -> dict:
+        return {
+            "action": self.action,
+            "started_at": self.started_at.isoformat(),
+            "scanned_files": self.scanned_files,
+            "scanned_rows": self.scanned_rows,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "counts": self.counts,
+            "samples": self.samples,
+        }
+
+    def summary(self) -> str:
+        return (
+            f"Reconciled {self.scanned_files} files and {self.scanned_rows} rows ({self.action}): "
+            f"{self.counts['orphan_files']} orphan files, {self.counts['dangling_links']} dangling links, "
+            f"{self.counts['dangling_blobs']} dangling blobs, {self.reclaimed_bytes} bytes reclaimed"
+        )
+
+
+def _batches(iterator: Iterator, size: int) -> Iterator[List]:
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _scan_files(directory: str, throttle: Throttle, cutoff: float, recursive: bool = False) -> Iterator[os.DirEntry]:
+    """Regular files old enough to judge; directories owned by other components are skipped"""
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            throttle.tick()
+            if entry.name.startswith("."):
+                continue
+            if recursive and entry.is_dir(follow_symlinks=False):
+                # Shard directories of the blob store
+                yield from _scan_files(entry.path, throttle, cutoff, recursive)
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                continue
+            yield entry
+
+
+def _dispose(entry_path: str, size: int, action: str, report: ReconcileReport, stamp: str):
+    if action == "report":
+        return
+    if action == "delete":
+        os.remove(entry_path)
+    else:
+        target = os.path.join(QUARANTINE_DIR, stamp, os.path.relpath(entry_path, UPLOAD_DIR))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(entry_path, target)
+    report.reclaimed_bytes += size
+
+
+def _find_orphan_blobs(db: Session, report: ReconcileReport, throttle: Throttle, cutoff: float, stamp: str):
+    for batch in _batches(_scan_files(BLOB_DIR, throttle, cutoff, recursive=True), RECONCILE_BATCH_SIZE):
+        report.scanned_files += len(batch)
+        shas = set()
+        for entry in batch:
+            stem, suffix = os.path.splitext(entry.name)
+            shas.add(stem if suffix in _SUFFIX_ENCODINGS else entry.name)
+        known = {
+            sha256: Blob.parse_variants(encodings)
+            for sha256, encodings in db.execute(
+                select(Blob.sha256, Blob.encodings).where(Blob.sha256.in_(shas))
+            )
+        }
+        for entry in batch:
+            stem, suffix = os.path.splitext(entry.name)
+            if suffix in _SUFFIX_ENCODINGS:
+                # A variant is only referenced while its encoding is recorded on the blob row
+                orphan = _SUFFIX_ENCODINGS[suffix] not in known.get(stem, {})
+            else:
+                orphan = entry.name not in known
+            if orphan:
+                report.add("orphan_files", entry.path)
+                _dispose(entry.path, entry.stat().st_size, report.action, report, stamp)
+
+
+def _find_orphan_legacy_files(db: Session, report: ReconcileReport, throttle: Throttle, cutoff: float, stamp: str):
+    # Files from before the blob store sit directly in UPLOAD_DIR
+    for batch in _batches(_scan_files(UPLOAD_DIR, throttle, cutoff), RECONCILE_BATCH_SIZE):
+        report.scanned_files += len(batch)
+        candidates = {}
+        for entry in batch:
+            candidates[entry.path] = entry
+            candidates[os.path.abspath(entry.path)] = entry
+        referenced = set(db.scalars(select(Link.file_path).where(Link.file_path.in_(candidates))))
+        for entry in batch:
+            if entry.path not in referenced and os.path.abspath(entry.path) not in referenced:
+                report.add("orphan_files", entry.path)
+                _dispose(entry.path, entry.stat().st_size, report.action, report, stamp)
+
+
+def _delete_links(db: Session, rows: List, blobs: List[str] = ()):
+    """Delete unusable links with their statistics (and their missing blobs), as the app's delete_links does"""
+    link_ids = [row.id for row in rows]
+    db.execute(delete(LinkStats).where(LinkStats.link_id.in_(link_ids)))
+    db.execute(delete(Link).where(Link.id.in_(link_ids)))
+    if blobs:
+        db.execute(delete(Blob).where(Blob.sha256.in_(blobs)))
+    db.commit()
+    # Only this process's caches can be reached; other workers catch up within LINK_CACHE_TTL
+    link_stats.discard(link_ids)
+    link_cache.invalidate(*[row.custom_link for row in rows])
+
+
+def _find_dangling_blobs(db: Session, report: ReconcileReport, throttle: Throttle, cutoff: float):
+    # Rows are committed just before their file is moved into place, so new rows are left alone
+    created_before = datetime.utcfromtimestamp(cutoff)
+    # Keyset pagination: constant cost per batch however large the table grows
+    last = ""
+    while True:
+        shas = db.scalars(
+            select(Blob.sha256)
+            .where(Blob.sha256 > last, Blob.created_at < created_before)
+            .order_by(Blob.sha256)
+            .limit(RECONCILE_BATCH_SIZE)
+        ).all()
+        if not shas:
+            break
+        last = shas[-1]
+        report.scanned_rows += len(shas)
+        missing = []
+        for sha256 in shas:
+            throttle.tick()
+            # Blobs not yet migrated to the current layout are still found where they are
+            if blob_store.locate(sha256) is None:
+                report.add("dangling_blobs", sha256)
+                missing.append(sha256)
+        if not missing:
+            continue
+        # Every link to a missing blob is unusable
+        links = db.execute(select(Link.id, Link.custom_link).where(Link.blob_sha256.in_(missing))).all()
+        for link in links:
+            report.add("dangling_links", link.custom_link)
+        if report.action == "delete":
+            _delete_links(db, links, missing)
+
+
+def _find_dangling_legacy_links(db: Session, report: ReconcileReport, throttle: Throttle):
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Link.id, Link.custom_link, Link.file_path)
+            .where(Link.id > last_id, Link.blob_sha256.is_(None))
+            .order_by(Link.id)
+            .limit(RECONCILE_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        report.scanned_rows += len(rows)
+        missing = []
+        for row in rows:
+            throttle.tick()
+            if not os.path.exists(row.file_path):
+                report.add("dangling_links", row.custom_link)
+                missing.append(row)
+        if missing and report.action == "delete":
+            _delete_links(db, missing)
+
+
+def _purge_quarantine(report: ReconcileReport, throttle: Throttle):
+    """Quarantined files are kept for RECONCILE_QUARANTINE_TTL, then deleted for good"""
+    cutoff = time.time() - RECONCILE_QUARANTINE_TTL
+    try:
+        entries = list(os.scandir(QUARANTINE_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        throttle.tick()
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            report.add("purged_quarantine", entry.path)
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def reconcile_storage(db: Session, action: str = RECONCILE_ACTION) -> ReconcileReport:
+    """Compare UPLOAD_DIR with the links and blobs tables and handle the differences"""
+    if action not in ("report", "quarantine", "delete"):
+        raise ValueError(f"Unknown reconcile action: {action}")
+    report = ReconcileReport(action)
+    throttle = Throttle(RECONCILE_MAX_OPS)
+    cutoff = time.time() - RECONCILE_GRACE
+    stamp = report.started_at.strftime("%Y%m%d-%H%M%S")
+
+    _find_orphan_blobs(db, report, throttle, cutoff, stamp)
+    _find_orphan_legacy_files(db, report, throttle, cutoff, stamp)
+    _find_dangling_blobs(db, report, throttle, cutoff)
+    _find_dangling_legacy_links(db, report, throttle)
+    if action != "report":
+        _purge_quarantine(report, throttle)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--action", choices=["report", "quarantine", "delete"], default="report")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    with get_db() as db:
+        report = reconcile_storage(db, args.action)
+    if args.json:
+        json.dump(report.as_dict(), sys.stdout, indent=2)
+        print()
+    else:
+        print(report.summary())
+        for category, items in report.samples.items():
+            for item in items:
+                print(f"  {category}: {item}")
+
+
+if __name__ == "__main__":
+    main()
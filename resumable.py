@@ -0,0 +1,147 @@
+import os
+import time
+import shutil
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from models import UploadSession
+from storage import UPLOAD_DIR, UPLOAD_CHUNK_SIZE, StagedUpload, hash_file
+
+# Resumable upload configuration
+RESUMABLE_CHUNK_SIZE = int(os.getenv("RESUMABLE_CHUNK_SIZE", 8 * 1024 * 1024))  # default chunk size offered to clients
+RESUMABLE_MAX_CHUNK_SIZE = int(os.getenv("RESUMABLE_MAX_CHUNK_SIZE", 64 * 1024 * 1024))
+RESUMABLE_SESSION_TTL = int(os.getenv("RESUMABLE_SESSION_TTL", 24 * 60 * 60))  # seconds without activity
+
+# Each session gets a directory holding one preallocated data file and a marker per received chunk
+SESSIONS_DIR = os.path.join(UPLOAD_DIR, ".sessions")
+
+
+def session_dir(upload_id: str) -> str:
+    return os.path.join(SESSIONS_DIR, upload_id)
+
+
+def data_path(upload_id: str) -> str:
+    return os.path.join(session_dir(upload_id), "data")
+
+
+def chunks_dir(upload_id: str) -> str:
+    return os.path.join(session_dir(upload_id), "chunks")
+
+
+def create_session_files(upload_id: str, total_size: int):
+    """Create the session directory and a sparse data file of the final size"""
+    os.makedirs(chunks_dir(upload_id), exist_ok=True)
+    with open(data_path(upload_id), "wb") as f:
+        f.truncate(total_size)
+
+
+def remove_session_files(upload_id: str):
+    shutil.rmtree(session_dir(upload_id), ignore_errors=True)
+
+
+def chunk_bounds(session: UploadSession, index: int):
+    """Return the (offset, length) a chunk index covers in the final file"""
+    if index < 0 or index >= session.chunk_count:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail="Chunk index out of range")
+    offset = index * session.chunk_size
+    return offset, min(session.chunk_size, session.total_size - offset)
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int):
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+async def write_chunk(session: UploadSession, index: int, body: AsyncIterator[bytes]):
+    """Write a chunk straight into its slot of the data file, then mark it as received"""
+    offset, expected = chunk_bounds(session, index)
+    fd = os.open(data_path(session.id), os.O_WRONLY)
+    written = 0
+    buffer = bytearray()
+    try:
+        async for piece in body:
+            if written + len(buffer) + len(piece) > expected:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Chunk {index} must be {expected} bytes")
+            buffer += piece
+            if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                await run_in_threadpool(_pwrite_all, fd, bytes(buffer), offset + written)
+                written += len(buffer)
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_pwrite_all, fd, bytes(buffer), offset + written)
+            written += len(buffer)
+    finally:
+        os.close(fd)
+
+    if written != expected:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Chunk {index} must be {expected} bytes")
+
+    # The marker is only created once the whole chunk is on disk, so retries are always safe
+    open(os.path.join(chunks_dir(session.id), str(index)), "wb").close()
+
+
+def received_chunks(upload_id: str) -> List[int]:
+    try:
+        return sorted(int(name) for name in os.listdir(chunks_dir(upload_id)))
+    except FileNotFoundError:
+        return []
+
+
+def received_ranges(session: UploadSession, chunks: List[int]) -> List[List[int]]:
+    """Collapse received chunk indexes into inclusive [first_byte, last_byte] ranges"""
+    ranges = []
+    for index in chunks:
+        offset, length = chunk_bounds(session, index)
+        if ranges and ranges[-1][1] + 1 == offset:
+            ranges[-1][1] = offset + length - 1
+        else:
+            ranges.append([offset, offset + length - 1])
+    return ranges
+
+
+async def stage_session(session: UploadSession) -> StagedUpload:
+    """Turn a completed session's data file into a StagedUpload ready to be published"""
+    missing = set(range(session.chunk_count)) - set(received_chunks(session.id))
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload is incomplete, missing chunks: {sorted(missing)[:20]}"
+        )
+    path = data_path(session.id)
+    sha256 = await run_in_threadpool(hash_file, path)
+    return StagedUpload(path, sha256, session.total_size)
+
+
+def expire_upload_sessions(db: Session) -> int:
+    """Delete sessions (and their files) that have seen no chunk writes within the TTL"""
+    now = datetime.utcnow()
+    expired = 0
+    for session in db.query(UploadSession).filter(UploadSession.expires_at < now).all():
+        # Chunk writes touch the data file, so its mtime tells us whether the client is still active
+        try:
+            last_write = datetime.utcfromtimestamp(os.path.getmtime(data_path(session.id)))
+        except OSError:
+            last_write = None
+
+        if last_write and last_write + timedelta(seconds=RESUMABLE_SESSION_TTL) > now:
+            session.expires_at = last_write + timedelta(seconds=RESUMABLE_SESSION_TTL)
+            continue
+
+        remove_session_files(session.id)
+        db.delete(session)
+        expired += 1
+    db.commit()
+
+    # Remove directories left behind by sessions whose rows never committed
+    if os.path.isdir(SESSIONS_DIR):
+        known = {row.id for row in db.query(UploadSession.id).all()}
+        for entry in os.scandir(SESSIONS_DIR):
+            if entry.name not in known and entry.stat().st_mtime + RESUMABLE_SESSION_TTL < time.time():
+                remove_session_files(entry.name)
+
+    return expired
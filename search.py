@@ -0,0 +1,78 @@
+import os
+from typing import List
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import lazyload
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+from models import Link
+from database import DB_TYPE
+from listing import link_json
+
+load_dotenv()
+
+# Search configuration
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", 20))  # results unless ?limit= asks otherwise
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_QUERY_LENGTH = 255
+# Trigram indexes only answer substring queries of at least three characters; shorter
+# queries match link name prefixes only
+SEARCH_MIN_SUBSTRING = 3
+
+
+def _like_pattern(query: str, prefix_only: bool) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix_only else f"%{escaped}%"
+
+
+async def _prefix_ids(db: AsyncSession, query: str, limit: int) -> List[int]:
+    """Links whose name starts with the query, case-insensitively, in name order"""
+    if DB_TYPE == 'postgres':
+        # Served by the lower(custom_link) text_pattern_ops btree, which unlike the trigram index
+        # takes one- and two-character prefixes. Its order is bytewise, so matches are sorted
+        condition = func.lower(Link.custom_link).like(func.lower(_like_pattern(query, True)), escape="\\")
+    else:
+        # A range on the lower(custom_link) index; unlike LIKE it never falls back to a full scan, and the
+        # walk stops after `limit` rows. The query is lowered by SQLite too, so both sides fold case the
+        # same way (ASCII only)
+        lowered = func.lower(query)
+        condition = func.lower(Link.custom_link).between(lowered, lowered + "\U0010ffff")
+    return list(await db.scalars(
+        select(Link.id).where(condition).order_by(func.lower(Link.custom_link), Link.custom_link).limit(limit)
+    ))
+
+
+async def _substring_ids(db: AsyncSession, query: str, limit: int) -> List[int]:
+    """Links whose name or filename contains the query, newest first"""
+    if DB_TYPE == 'postgres':
+        pattern = _like_pattern(query, False)
+        return list(await db.scalars(
+            select(Link.id)
+            .where(Link.custom_link.ilike(pattern, escape="\\") | Link.filename.ilike(pattern, escape="\\"))
+            .order_by(Link.id.desc())
+            .limit(limit)
+        ))
+    # A quoted phrase is a case-insensitive substring match for the trigram tokenizer.
+    # The index is walked in rowid order, so it stops after `limit` hits however common the query is
+    phrase = '"' + query.replace('"', '""') + '"'
+    return list(await db.scalars(
+        text("SELECT rowid FROM links_fts WHERE links_fts MATCH :phrase ORDER BY rowid DESC LIMIT :limit"),
+        {"phrase": phrase, "limit": limit}
+    ))
+
+
+async def search_links(db: AsyncSession, query: str, limit: int = SEARCH_LIMIT) -> List[dict]:
+    """Links matching the query by name prefix first, then by substring of the name or filename"""
+    query = query.strip()[:SEARCH_MAX_QUERY_LENGTH]
+    if not query:
+        return []
+    ids = await _prefix_ids(db, query, limit)
+    if len(ids) < limit and len(query) >= SEARCH_MIN_SUBSTRING:
+        ids += [link_id for link_id in await _substring_ids(db, query, limit) if link_id not in ids]
+    ids = ids[:limit]
+    if not ids:
+        return []
+
+    links = list(await db.scalars(select(Link).options(lazyload(Link.blob)).where(Link.id.in_(ids))))
+    order = {link_id: position for position, link_id in enumerate(ids)}
+    links.sort(key=lambda link: order[link.id])
+    return [link_json(link) for link in links]
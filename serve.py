@@ -0,0 +1,58 @@
+"""Production launcher: one-time setup, then several uvicorn workers sharing one port.
+
+    python serve.py                  # WEB_WORKERS workers on HOST:PORT
+    python serve.py --workers 4      # override the worker count
+
+On SIGTERM/SIGINT each worker stops accepting connections, lets in-flight requests and
+streaming downloads finish for up to GRACEFUL_TIMEOUT seconds, flushes its buffered
+statistics and exits.
+"""
+import os
+import argparse
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Server configuration
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", os.cpu_count() or 1))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))  # seconds to drain in-flight requests on shutdown
+
+
+def prepare(workers: int):
+    """Setup that must happen once per launch, not once per worker"""
+    from storage import ensure_upload_dir
+    ensure_upload_dir()
+    # Workers import main.py without repeating the setup above
+    os.environ["SERVE_PREPARED"] = "1"
+    # Admin session activity must be visible to every worker
+    if workers > 1 and "SESSION_STORE" not in os.environ:
+        os.environ["SESSION_STORE"] = "database"
+        print("Using SESSION_STORE=database so sessions are shared by all workers")
+    elif workers > 1 and os.environ["SESSION_STORE"] == "memory":
+        print("Warning: SESSION_STORE=memory keeps a separate session timeout in each worker")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    args = parser.parse_args()
+    workers = max(args.workers, 1)
+
+    prepare(workers)
+    print(f"Starting {workers} worker(s) on {args.host}:{args.port}")
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+
+
+if __name__ == "__main__":
+    main()
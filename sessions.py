@@ -0,0 +1,140 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, delete
+from dotenv import load_dotenv
+from models import AdminSession
+from database import DB_TYPE, get_async_db
+
+load_dotenv()
+
+# Session store configuration
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")  # 'memory' (per process) or 'database' (shared by workers)
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", 10000))
+SESSION_RETENTION = int(os.getenv("SESSION_RETENTION", 24 * 60 * 60))  # forget idle sessions after a day
+SESSION_FLUSH_INTERVAL = int(os.getenv("SESSION_FLUSH_INTERVAL", 10))  # seconds between batched writes
+
+
+def session_key(authorization: str) -> str:
+    """Sessions are keyed by a hash so raw credentials are never kept in memory or the database"""
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+
+class MemorySessionStore:
+    """Per-process last-activity store, bounded by entry count (LRU) and age"""
+
+    def __init__(self, timeout: int, max_entries: int = SESSION_MAX_ENTRIES, retention: int = SESSION_RETENTION):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        # Keep sessions a while past the timeout so returning users are still sent to /logout
+        self.retention = max(retention, timeout)
+        self._last_seen = OrderedDict()
+
+    def __len__(self):
+        return len(self._last_seen)
+
+    def _get_local(self, key: str) -> Optional[float]:
+        last_seen = self._last_seen.get(key)
+        if last_seen is not None and time.time() - last_seen > self.retention:
+            self._last_seen.pop(key, None)
+            return None
+        return last_seen
+
+    def _set_local(self, key: str, last_seen: float):
+        self._last_seen[key] = last_seen
+        self._last_seen.move_to_end(key)
+        while len(self._last_seen) > self.max_entries:
+            self._last_seen.popitem(last=False)
+
+    async def last_seen(self, key: str) -> Optional[float]:
+        return self._get_local(key)
+
+    def touch(self, key: str, now: float):
+        self._set_local(key, now)
+
+    async def remove(self, key: str):
+        self._last_seen.pop(key, None)
+
+    async def flush(self):
+        pass
+
+
+class DatabaseSessionStore(MemorySessionStore):
+    """Session store shared by all workers through the admin_sessions table.
+
+    Activity is buffered locally and written in one batched upsert every SESSION_FLUSH_INTERVAL
+    seconds; the database is only read when the local copy is missing or looks expired.
+    """
+
+    def __init__(self, timeout: int, **kwargs):
+        super().__init__(timeout, **kwargs)
+        self._dirty = {}
+        self._last_prune = 0.0
+
+    async def last_seen(self, key: str) -> Optional[float]:
+        local = self._get_local(key)
+        if local is not None and time.time() - local <= self.timeout:
+            return local
+
+        # Another worker may have seen this session more recently
+        async with get_async_db() as db:
+            stored = await db.scalar(select(AdminSession.last_seen).where(AdminSession.key == key))
+        if stored is not None:
+            stored = (stored - datetime(1970, 1, 1)).total_seconds()
+            if local is None or stored > local:
+                self._set_local(key, stored)
+                return stored
+        return local
+
+    def touch(self, key: str, now: float):
+        super().touch(key, now)
+        self._dirty[key] = now
+        if len(self._dirty) >= self.max_entries:
+            self._dirty.pop(next(iter(self._dirty)))
+
+    async def remove(self, key: str):
+        await super().remove(key)
+        self._dirty.pop(key, None)
+        async with get_async_db() as db:
+            await db.execute(delete(AdminSession).where(AdminSession.key == key))
+            await db.commit()
+
+    async def flush(self):
+        if self._dirty:
+            dirty, self._dirty = self._dirty, {}
+            rows = [{"key": key, "last_seen": datetime.utcfromtimestamp(ts)} for key, ts in dirty.items()]
+            if DB_TYPE == 'postgres':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(AdminSession)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[AdminSession.key],
+                set_={"last_seen": stmt.excluded.last_seen},
+                where=AdminSession.last_seen < stmt.excluded.last_seen
+            )
+            try:
+                async with get_async_db() as db:
+                    await db.execute(stmt, rows)
+                    await db.commit()
+            except Exception:
+                # Keep the activity for the next attempt, unless newer activity was recorded meanwhile
+                for key, ts in dirty.items():
+                    self._dirty.setdefault(key, ts)
+                raise
+
+        if time.time() - self._last_prune > self.retention / 24:
+            self._last_prune = time.time()
+            async with get_async_db() as db:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+                await db.execute(delete(AdminSession).where(AdminSession.last_seen < cutoff))
+                await db.commit()
+
+
+def create_session_store(timeout: int) -> MemorySessionStore:
+    if SESSION_STORE == "database":
+        return DatabaseSessionStore(timeout)
+    return MemorySessionStore(timeout)
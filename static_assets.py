@@ -0,0 +1,113 @@
+import os
+import io
+import hashlib
+import mimetypes
+from typing import Dict
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+from compression import COMPRESSION_MIN_SIZE, COMPRESSION_MIN_SAVING, available_encoders, choose_encoding, is_compressible
+from file_response import etag_matches
+
+STATIC_DIR = "static"
+STATIC_URL = "/static/"
+# A fingerprinted URL never changes content, so browsers may keep it for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Digest characters in fingerprinted names (styles.3f2a9c0d1e4b.css)
+FINGERPRINT_LENGTH = 12
+
+
+class StaticAsset:
+    """One file from STATIC_DIR, held in memory with its precompressed variants"""
+
+    def __init__(self, body: bytes, digest: str, media_type: str, variants: Dict[str, bytes]):
+        self.body = body
+        self.digest = digest
+        self.media_type = media_type
+        self.variants = variants
+
+
+def fingerprinted_name(path: str, digest: str) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def compress_asset(body: bytes, media_type: str, path: str) -> Dict[str, bytes]:
+    """Variants worth keeping, built with the same encoders as stored files"""
+    if len(body) < COMPRESSION_MIN_SIZE or not is_compressible(media_type, path):
+        return {}
+    variants = {}
+    for encoding, compress in available_encoders().items():
+        target = io.BytesIO()
+        compress(io.BytesIO(body), target)
+        if target.tell() <= len(body) * (1 - COMPRESSION_MIN_SAVING):
+            variants[encoding] = target.getvalue()
+    return variants
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """StaticFiles that also serves every asset under a content-hashed name with immutable caching.
+
+    Assets are fingerprinted and compressed once when the app starts; plain names keep working
+    with revalidation for pages rendered before a deploy.
+    """
+
+    def __init__(self, directory: str = STATIC_DIR):
+        super().__init__(directory=directory)
+        self.assets: Dict[str, StaticAsset] = {}
+        self.urls: Dict[str, str] = {}
+        self.build()
+
+    def build(self):
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for filename in files:
+                if filename.startswith("."):
+                    continue
+                full_path = os.path.join(root, filename)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    body = f.read()
+                digest = hashlib.sha256(body).hexdigest()
+                media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                name = fingerprinted_name(path, digest)
+                self.assets[name] = StaticAsset(body, digest, media_type, compress_asset(body, media_type, path))
+                self.urls[path] = name
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL for a file in STATIC_DIR; unknown files keep their plain URL"""
+        return STATIC_URL + self.urls.get(path, path)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        asset = self.assets.get(path)
+        if asset is None:
+            return await super().get_response(path, scope)
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+
+        request_headers = Headers(scope=scope)
+        body, etag = asset.body, asset.digest
+        headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+            encoding = choose_encoding(request_headers.get("accept-encoding"), asset.variants)
+            if encoding:
+                body, etag = asset.variants[encoding], f"{asset.digest}-{encoding}"
+                headers["Content-Encoding"] = encoding
+        headers["ETag"] = f'"{etag}"'
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type=asset.media_type, headers=headers)
+
+
+static_files = FingerprintedStaticFiles()
+
+
+def static_url(path: str) -> str:
+    """Template helper: {{ static_url('styles.css') }}"""
+    return static_files.url(path)
@@ -0,0 +1,354 @@
+import os
+import errno
+import shutil
+import hashlib
+import secrets
+import aiofiles
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import UploadFile, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+from models import Blob
+
+load_dotenv()
+
+# Storage configuration
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # 1 MiB per read/write
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 10 * 1024 ** 3))  # 10 GiB, 0 disables the limit
+# Form fields, boundaries and part headers a multipart upload may add on top of MAX_UPLOAD_SIZE
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Incoming files are staged inside UPLOAD_DIR so the final rename never crosses filesystems
+STAGING_DIR = os.path.join(UPLOAD_DIR, ".incoming")
+
+# File contents are stored once per SHA-256, no matter how many links point at them
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+# Precompressed variants live next to their blob with these suffixes
+VARIANT_SUFFIXES = {"gzip": ".gz", "br": ".br", "zstd": ".zst"}
+# 'sharded' fans blobs out over hash-prefix directories (blobs/ab/cd/abcd...), 'flat' keeps them in one
+STORAGE_LAYOUT = os.getenv("STORAGE_LAYOUT", "sharded")
+STORAGE_SHARD_DEPTH = int(os.getenv("STORAGE_SHARD_DEPTH", 2))  # directory levels of 256 entries each
+
+
+def ensure_upload_dir():
+    """Create the upload directory if it doesn't exist"""
+    try:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        print(f"Upload directory confirmed: {os.path.abspath(UPLOAD_DIR)}")
+    except Exception as e:
+        raise Exception(f"Failed to create upload directory: {e}")
+
+
+class StagedUpload:
+    """An upload that has been fully received into a temp file but not yet published"""
+
+    def __init__(self, temp_path: str, sha256: str, size: int):
+        self.temp_path = temp_path
+        self.sha256 = sha256
+        self.size = size
+
+    def commit(self, final_path: str):
+        """Atomically move the staged file to its final location"""
+        os.replace(self.temp_path, final_path)
+        self.temp_path = None
+
+    def discard(self):
+        """Remove the staged file if it has not been committed"""
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        self.temp_path = None
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file on disk, read in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def check_upload_size(size: int):
+    """Reject uploads larger than MAX_UPLOAD_SIZE"""
+    if MAX_UPLOAD_SIZE and size > MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the maximum upload size of {MAX_UPLOAD_SIZE} bytes"
+        )
+
+
+def check_multipart_length(content_length: Optional[str]):
+    """Reject a multipart upload from its Content-Length, before the form parser spools the body to disk"""
+    if not MAX_UPLOAD_SIZE:
+        return
+    if content_length is None:
+        raise HTTPException(status_code=status.HTTP_411_LENGTH_REQUIRED, detail="Content-Length required")
+    if not content_length.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    check_upload_size(int(content_length) - MULTIPART_OVERHEAD)
+
+
+async def stage_upload(file: UploadFile) -> StagedUpload:
+    """Copy an upload to a temp file chunk by chunk, hashing and counting bytes as they arrive"""
+    if file.size is not None:
+        check_upload_size(file.size)
+
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    temp_path = os.path.join(STAGING_DIR, secrets.token_hex(16))
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                check_upload_size(size)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return StagedUpload(temp_path, digest.hexdigest(), size)
+
+
+def _preallocate(fd: int, size: Optional[int]):
+    """Reserve the file's blocks up front: less fragmentation, and a full disk fails before the body is sent"""
+    if not size or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as e:
+        if e.errno == errno.ENOSPC:
+            raise HTTPException(status_code=status.HTTP_507_INSUFFICIENT_STORAGE, detail="Not enough disk space for this upload")
+        # Filesystems without fallocate support just grow the file as it is written
+
+
+def _write_block(fd: int, digest, data: bytes):
+    # Hashing releases the GIL for large buffers, so it runs on the worker thread alongside the write
+    digest.update(data)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+async def stage_stream(body: AsyncIterator[bytes], expected_size: Optional[int] = None) -> StagedUpload:
+    """Copy a raw request body to a temp file, hashing as it arrives.
+
+    With a known size (Content-Length) the file is preallocated and the body must match it exactly.
+    """
+    if expected_size is not None:
+        check_upload_size(expected_size)
+
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    temp_path = os.path.join(STAGING_DIR, secrets.token_hex(16))
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    digest = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+
+    try:
+        try:
+            await run_in_threadpool(_preallocate, fd, expected_size)
+            async for piece in body:
+                size += len(piece)
+                check_upload_size(size)
+                if expected_size is not None and size > expected_size:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Request body is longer than Content-Length")
+                buffer += piece
+                if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                    await run_in_threadpool(_write_block, fd, digest, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(_write_block, fd, digest, bytes(buffer))
+        finally:
+            os.close(fd)
+        if expected_size is not None and size != expected_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Request body ended after {size} of {expected_size} bytes"
+            )
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return StagedUpload(temp_path, digest.hexdigest(), size)
+
+
+class FlatBlobStore:
+    """Blobs on the local filesystem, all directly in BLOB_DIR (the layout used before sharding).
+
+    Downloads are sent with sendfile, so stores hand out local paths rather than streams.
+    """
+
+    def __init__(self, root: str = BLOB_DIR):
+        self.root = root
+
+    def relative_path(self, sha256: str) -> str:
+        return sha256
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, self.relative_path(sha256))
+
+    def candidate_paths(self, sha256: str) -> List[str]:
+        """This store's path for a blob first, then the paths every other known layout would use"""
+        paths = [self.path(sha256)]
+        for store in [FlatBlobStore(self.root)] + [ShardedBlobStore(self.root, depth) for depth in (1, 2, 3)]:
+            if store.path(sha256) not in paths:
+                paths.append(store.path(sha256))
+        return paths
+
+    def locate(self, sha256: str) -> Optional[str]:
+        """Where a blob is stored, including blobs not yet migrated from another layout"""
+        for path in self.candidate_paths(sha256):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def link_into_place(self, source_path: str, sha256: str) -> str:
+        """Hard-link a stored file and its variants to this store's path for it; the source stays valid"""
+        target = self.path(sha256)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        for suffix in [""] + list(VARIANT_SUFFIXES.values()):
+            if not os.path.exists(source_path + suffix) or os.path.exists(target + suffix):
+                continue
+            try:
+                os.link(source_path + suffix, target + suffix)
+            except FileExistsError:
+                pass
+            except OSError:
+                # Filesystems without hard links get a copy, renamed into place so it is never partial
+                temp_path = f"{target}{suffix}.{secrets.token_hex(4)}.tmp"
+                shutil.copyfile(source_path + suffix, temp_path)
+                os.replace(temp_path, target + suffix)
+        return target
+
+    def place(self, staged: StagedUpload) -> bool:
+        """Move a staged upload into the store. Returns True if the content was new"""
+        path = self.path(staged.sha256)
+        if os.path.exists(path):
+            staged.discard()
+            return False
+        previous = self.locate(staged.sha256)
+        if previous:
+            # Same content still in an older layout: share it (and its variants) instead of storing it twice
+            self.link_into_place(previous, staged.sha256)
+            staged.discard()
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        staged.commit(path)
+        return True
+
+    def retire(self, sha256: str) -> List[Tuple[str, str]]:
+        """Rename a blob and its variants aside wherever they are stored; returns (path, retired path) pairs.
+
+        A rename is atomic, so a concurrent place() either finds the file in place or no file at all.
+        """
+        token = secrets.token_hex(4)
+        retired = []
+        for path in self.candidate_paths(sha256):
+            for candidate in [path] + [path + suffix for suffix in VARIANT_SUFFIXES.values()]:
+                aside = f"{candidate}.{token}.removing"
+                try:
+                    os.rename(candidate, aside)
+                except FileNotFoundError:
+                    continue
+                retired.append((candidate, aside))
+        return retired
+
+    def restore(self, retired: List[Tuple[str, str]]):
+        """Put retired files back; a copy placed meanwhile has the same content"""
+        for path, aside in retired:
+            os.replace(aside, path)
+
+    def purge(self, retired: List[Tuple[str, str]]):
+        for _, aside in retired:
+            os.remove(aside)
+
+    def remove(self, sha256: str):
+        """Unlink a blob and its variants wherever they are stored"""
+        self.purge(self.retire(sha256))
+
+
+class ShardedBlobStore(FlatBlobStore):
+    """Blobs fanned out by hash prefix, so no directory grows past a few thousand entries"""
+
+    def __init__(self, root: str = BLOB_DIR, depth: int = STORAGE_SHARD_DEPTH):
+        super().__init__(root)
+        self.depth = depth
+
+    def relative_path(self, sha256: str) -> str:
+        shards = [sha256[level * 2:level * 2 + 2] for level in range(self.depth)]
+        return os.path.join(*shards, sha256)
+
+
+def create_blob_store() -> FlatBlobStore:
+    if STORAGE_LAYOUT == "flat" or STORAGE_SHARD_DEPTH <= 0:
+        return FlatBlobStore()
+    return ShardedBlobStore()
+
+
+blob_store = create_blob_store()
+
+
+def blob_path(sha256: str) -> str:
+    return blob_store.path(sha256)
+
+
+async def acquire_blob(db: AsyncSession, sha256: str, size: int):
+    """Add a reference to the blob with this content, creating its row if it is new.
+
+    The caller commits; a concurrent insert of the same blob surfaces as an IntegrityError.
+    """
+    result = await db.execute(
+        update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count + 1)
+    )
+    if not result.rowcount:
+        db.add(Blob(sha256=sha256, size=size, ref_count=1))
+        await db.flush()
+
+
+def place_blob(staged: StagedUpload) -> bool:
+    """Move a staged upload into the blob store after its reference has been committed.
+
+    Returns True if the content was new, False if an identical blob was already stored.
+    """
+    return blob_store.place(staged)
+
+
+async def release_blob(db: AsyncSession, sha256: str) -> bool:
+    """Drop a reference to a blob. Returns True if its row was deleted and the file should be removed.
+
+    The caller commits, then calls remove_blob.
+    """
+    await db.execute(
+        update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count - 1)
+    )
+    result = await db.execute(
+        delete(Blob).where(Blob.sha256 == sha256, Blob.ref_count <= 0)
+    )
+    return bool(result.rowcount)
+
+
+async def remove_blob(db: AsyncSession, sha256: str):
+    """Unlink a released blob, unless a concurrent upload has re-created it meanwhile.
+
+    The files are renamed aside before the row is checked. An upload that still found them in
+    place had committed its row first, so the check sees it and the files are put back; one that
+    found none places its own copy.
+    """
+    retired = blob_store.retire(sha256)
+    # End any open read so the check runs on a snapshot taken after the rename
+    await db.commit()
+    if await db.scalar(select(Blob.sha256).where(Blob.sha256 == sha256)) is None:
+        blob_store.purge(retired)
+    else:
+        blob_store.restore(retired)
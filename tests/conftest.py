@@ -0,0 +1,46 @@
+"""Shared fixtures: the app runs against a scratch SQLite database and upload directory.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN = ("test-admin", "test-password")
+WORKDIR = tempfile.mkdtemp(prefix="file-storage-tests-")
+
+# Set before main is imported; load_dotenv() never overrides variables that are already set
+os.environ.update({
+    "ADMIN_USERNAME": ADMIN[0],
+    "ADMIN_PASSWORD": ADMIN[1],
+    "DB_TYPE": "sqlite",
+    "DB_NAME": "test",
+    "DATABASE_PATH": os.path.join(WORKDIR, "data"),
+    "UPLOAD_DIR": os.path.join(WORKDIR, "uploads"),
+    "PREVIEW_WORKERS": "1",
+    "COMPRESSION_ENABLED": "false",
+})
+sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=REPO_ROOT, check=True,
+                   stdout=subprocess.DEVNULL)
+    import main
+    with TestClient(main.app) as client:
+        yield client
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+def upload(client, custom_link: str, content: bytes, filename: str = "file.txt"):
+    response = client.post(
+        "/upload/", auth=ADMIN, data={"custom_link": custom_link, "is_public": "true"},
+        files={"file": (filename, content)}, follow_redirects=False
+    )
+    assert response.status_code == 303, response.text
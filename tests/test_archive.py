@@ -0,0 +1,35 @@
+import io
+import os
+import hashlib
+import zipfile
+from conftest import ADMIN, upload
+
+
+def test_zip_refuses_members_missing_from_storage(client):
+    import storage
+    upload(client, "zip-present", b"present", filename="present.txt")
+    upload(client, "zip-lost", b"lost from disk", filename="lost.txt")
+    os.remove(storage.blob_path(hashlib.sha256(b"lost from disk").hexdigest()))
+
+    response = client.get("/batch/zip", params={"custom_links": ["zip-present", "zip-lost"]}, auth=ADMIN)
+    assert response.status_code == 404
+    assert "lost.txt" in response.json()["detail"]
+
+    response = client.get("/batch/zip", params={"custom_links": ["zip-present"]}, auth=ADMIN)
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["present.txt"]
+
+
+def test_zip_lists_files_removed_while_streaming(tmp_path):
+    from archive import ArchiveEntry, stream_zip
+    kept = tmp_path / "kept.txt"
+    kept.write_bytes(b"kept")
+    entries = [
+        ArchiveEntry("kept.txt", str(kept), 0),
+        ArchiveEntry("MISSING.txt", str(tmp_path / "gone"), 0),
+    ]
+    with zipfile.ZipFile(io.BytesIO(b"".join(stream_zip(entries)))) as archive:
+        assert archive.namelist() == ["kept.txt", "MISSING (2).txt"]
+        assert archive.read("kept.txt") == b"kept"
+        assert "MISSING.txt" in archive.read("MISSING (2).txt").decode()
@@ -0,0 +1,52 @@
+from sqlalchemy import insert, select, func
+from conftest import ADMIN
+
+
+def seed_links(prefix: str, sizes):
+    from database import engine
+    from models import Link
+    with engine.begin() as conn:
+        conn.execute(insert(Link), [
+            {"custom_link": f"{prefix}-{i}", "base_link": f"{prefix}-{i}", "file_path": f"/nonexistent/{prefix}-{i}",
+             "filename": f"{prefix}-{i}.bin", "is_public": i % 2 == 0, "size": size}
+            for i, size in enumerate(sizes)
+        ])
+
+
+def expected_order(descending: bool, visibility: str):
+    from database import engine
+    from models import Link
+    key = func.coalesce(Link.size, -1)
+    query = select(Link.custom_link)
+    if visibility != "all":
+        query = query.where(Link.is_public == (visibility == "public"))
+    query = query.order_by(key.desc(), Link.id.desc()) if descending else query.order_by(key, Link.id)
+    with engine.connect() as conn:
+        return list(conn.scalars(query))
+
+
+def all_pages(client, limit: int, **params):
+    pages, cursor = [], None
+    while True:
+        query = {"sort": "size", "limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/api/links", params=query, auth=ADMIN)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        pages.append([link["custom_link"] for link in page["links"]])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def test_size_pagination_with_ties(client):
+    # Most rows share one size, so pages start and end inside a run of ties
+    seed_links("tied", [4096] * 95 + [None] * 7 + [10, 99999, 4096, 1])
+    for order in ("desc", "asc"):
+        for visibility in ("all", "public", "private"):
+            expected = expected_order(order == "desc", visibility)
+            pages = all_pages(client, 10, order=order, visibility=visibility)
+            assert [name for page in pages for name in page] == expected
+            assert len(pages) == max(1, -(-len(expected) // 10))
+            assert all(len(page) == 10 for page in pages[:-1])
@@ -0,0 +1,18 @@
+from conftest import ADMIN, upload
+
+
+def search(client, query: str):
+    response = client.get("/api/search", params={"q": query}, auth=ADMIN)
+    assert response.status_code == 200, response.text
+    return [link["custom_link"] for link in response.json()["links"]]
+
+
+def test_prefix_search_ignores_case(client):
+    for name in ("Zq-Report", "zq-notes", "ZQ_upper"):
+        upload(client, name, name.encode())
+    for query in ("zq", "ZQ", "zQ-", "Z"):
+        assert [name for name in search(client, query) if name.lower().startswith("zq")] == [
+            name for name in ("zq-notes", "Zq-Report", "ZQ_upper") if name.lower().startswith(query.lower())
+        ]
+    # LIKE wildcards in the query are matched literally
+    assert search(client, "zq%") == []
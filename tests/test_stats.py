@@ -0,0 +1,45 @@
+from conftest import ADMIN, upload
+
+
+def stored_stats(link_id: int):
+    from database import get_db
+    from models import LinkStats
+    with get_db() as db:
+        return db.get(LinkStats, link_id)
+
+
+def link_id(custom_link: str) -> int:
+    from database import get_db
+    from models import Link
+    with get_db() as db:
+        return db.query(Link.id).filter(Link.custom_link == custom_link).scalar()
+
+
+def test_flush_skips_links_deleted_meanwhile(client):
+    from link_stats import link_stats
+    upload(client, "stats-kept", b"kept")
+    upload(client, "stats-deleted", b"deleted")
+    kept, deleted = link_id("stats-kept"), link_id("stats-deleted")
+    assert client.post("/delete/stats-deleted", auth=ADMIN, follow_redirects=False).status_code == 303
+
+    # Counts another worker buffered before the delete, flushed after it
+    link_stats.record(kept, 200, 4)
+    link_stats.record(deleted, 200, 7)
+    client.portal.call(link_stats.flush)
+
+    assert stored_stats(deleted) is None
+    assert stored_stats(kept).downloads == 1
+    assert len(link_stats) == 0
+
+
+def test_previews_are_not_downloads(client):
+    from link_stats import link_stats
+    upload(client, "stats-preview", b"plain text preview", filename="notes.txt")
+    assert client.get("/preview/stats-preview").status_code == 200
+    assert client.get("/preview/stats-preview", params={"original": 1}).status_code == 200
+    assert client.get("/download/stats-preview").status_code == 200
+    client.portal.call(link_stats.flush)
+
+    stats = client.get("/stats/stats-preview", auth=ADMIN).json()
+    assert stats["downloads"] == 1
+    assert stats["bytes_sent"] > len(b"plain text preview")
@@ -0,0 +1,43 @@
+import os
+import hashlib
+from conftest import ADMIN, upload
+
+
+def test_remove_blob_keeps_files_reuploaded_during_delete(client, monkeypatch):
+    import storage
+    from sqlalchemy import insert
+    from database import engine
+    from models import Blob
+
+    content = b"content uploaded again while its last link is deleted"
+    sha256 = hashlib.sha256(content).hexdigest()
+    upload(client, "race-old", content)
+    retire = storage.blob_store.retire
+
+    def upload_during_removal(sha):
+        # What a concurrent upload of the same content does between the delete's commit and the
+        # unlink: commit its row, find the file still in place and drop its staged copy
+        with engine.begin() as conn:
+            conn.execute(insert(Blob).values(sha256=sha, size=len(content), ref_count=1))
+        staged_path = os.path.join(storage.STAGING_DIR, "race")
+        os.makedirs(storage.STAGING_DIR, exist_ok=True)
+        with open(staged_path, "wb") as f:
+            f.write(content)
+        assert not storage.place_blob(storage.StagedUpload(staged_path, sha, len(content)))
+        return retire(sha)
+
+    monkeypatch.setattr(storage.blob_store, "retire", upload_during_removal)
+    assert client.post("/delete/race-old", auth=ADMIN, follow_redirects=False).status_code == 303
+    with open(storage.blob_path(sha256), "rb") as f:
+        assert f.read() == content
+
+
+def test_remove_blob_deletes_unreferenced_files(client):
+    import storage
+    content = b"content nobody else uploads"
+    upload(client, "gone", content)
+    path = storage.blob_path(hashlib.sha256(content).hexdigest())
+    assert os.path.exists(path)
+    assert client.post("/delete/gone", auth=ADMIN, follow_redirects=False).status_code == 303
+    assert not os.path.exists(path)
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".removing")]